@@ -0,0 +1,53 @@
+"""Shared ADK runners with per-invocation sessions.
+
+One `Runner` per agent and one in-memory session service are built on first
+use and reused by every request, so concurrent runs (e.g. a portfolio batch)
+don't each pay for runner construction. Each invocation gets its own uniquely
+named session, which is deleted afterwards so the shared service doesn't grow.
+"""
+
+## Standard Libraries
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+APP_NAME = "ai_analyst"
+USER_ID = "1234"
+
+
+@lru_cache(maxsize=None)
+def get_session_service():
+    from google.adk.sessions import InMemorySessionService
+
+    return InMemorySessionService()
+
+
+@lru_cache(maxsize=None)
+def get_runner(agent_factory: Callable[[], Any]):
+    """Runner for the agent built by `agent_factory` (itself cached)."""
+    from google.adk.runners import Runner
+
+    return Runner(
+        agent=agent_factory(),
+        app_name=APP_NAME,
+        session_service=get_session_service(),
+    )
+
+
+@asynccontextmanager
+async def session(state: Optional[Dict[str, Any]] = None):
+    """A fresh session for one invocation, removed on exit."""
+    service = get_session_service()
+    created = await service.create_session(
+        app_name=APP_NAME,
+        user_id=USER_ID,
+        state=state,
+        session_id=uuid.uuid4().hex,
+    )
+    try:
+        yield created
+    finally:
+        await service.delete_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=created.id
+        )
@@ -1,37 +1,17 @@
-import io
+import asyncio
 import json
-import base64, os
-from os import environ
-from io import BytesIO
-from google import genai
-from docx import Document
-from google.genai import types
-from google.cloud import storage
-from google.cloud import storage
-from google.adk.runners import Runner
-# from PyPDF2 import PdfReader, PdfWriter
-from google.oauth2 import service_account
-from google.adk.sessions import InMemorySessionService
-from google.adk.agents import LlmAgent, SequentialAgent
-
-credentials = service_account.Credentials.from_service_account_info(
-    {
-        "type": "service_account",
-        "project_id": environ["PROJECT_ID_SA"],
-        "private_key_id": environ["PRIVATE_KEY_ID"],
-        "private_key": environ["PRIVATE_KEY"].replace("\\n", "\n"),
-        "client_email": environ["CLIENT_EMAIL"],
-        "client_id": environ["CLIENT_ID"],
-        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-        "token_uri": "https://oauth2.googleapis.com/token",
-        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-        "client_x509_cert_url": environ["CLIENT_X509_CERT_URL"],
-    }
-)
- 
- 
-def _is_local_path(p: str) -> bool:
-    return os.path.exists(p)
+import os
+import time
+from functools import lru_cache
+from clients import get_genai_client
+import llm_admission
+import neardup
+import routing
+from agent_runtime import get_runner, session as agent_session
+from compaction import compact_texts
+from documents import as_bytes, decode_text, open_document, open_document_file, pdf_page_texts, select_pdf_pages
+from hedging import get_hedger
+from telemetry import AgentStageTimer, record_neardup_pages, record_route, record_tokens, span
  
  
 def safe_load_json(s: str):
@@ -42,188 +22,194 @@ def safe_load_json(s: str):
     return json.loads(s)
  
  
-def _download_bytes_from_gcs_path(gcs_path: str) -> bytes:
- 
-    storage_client = storage.Client(
-        project=environ["PROJECT_ID"],
-        credentials=credentials,
-    )
-    # support gs://bucket/blob and plain blob (use BUCKET_NAME)
-    if gcs_path.startswith("gs://"):
-        _, _, rest = gcs_path.partition("gs://")
-        bucket_name, _, blob_name = rest.partition("/")
-        bucket = storage_client.bucket(bucket_name)
-    else:
-        bucket = storage_client.bucket(os.environ["GCS_BUCKET"])
-        blob_name = gcs_path
-    ## listing blobs for debug
-    list_blobs = list(bucket.list_blobs())
- 
-    blob = bucket.blob(blob_name)
-    data = BytesIO()
-    blob.download_to_file(data)
-    return data.getvalue()
- 
-def split_pdf_to_page_base64(pdf_bytes: bytes):
-    """
-    Yields (page_number, base64_page_pdf) for each page.
-    Works for both text PDFs and scanned-image PDFs.
-    """
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    num_pages = len(reader.pages)
-    base64_pages = []
-    for i in range(num_pages):
-        writer = PdfWriter()
-        writer.add_page(reader.pages[i])
-
-        buf = io.BytesIO()
-        writer.write(buf)
-        page_bytes = buf.getvalue()
-
-        page_b64 = base64.b64encode(page_bytes).decode("utf-8")
-        base64_pages.append((i + 1, page_b64))
-    return base64_pages
-        
 def read_docx(path: str) -> str:
     """Read and extract text from a DOCX file (local or GCS path)."""
-    if _is_local_path(path):
-        doc = Document(path)
-    else:
-        data = _download_bytes_from_gcs_path(path)
-        doc = Document(BytesIO(data))
+    from docx import Document
+
+    with open_document_file(path) as f:
+        doc = Document(f)
     return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
  
  
-def read_pdf_as_base64(path: str) -> str:
-    """Read a PDF file as base64 (local or GCS path)."""
-    if _is_local_path(path):
-        with open(path, "rb") as pdf_file:
-            pdf_bytes = pdf_file.read()
-    else:
-        pdf_bytes = _download_bytes_from_gcs_path(path)
+def _load_part(path: str):
+    """Read one local or GCS document and work out what still needs extracting
+    (blocking I/O).
 
-    return base64.b64encode(pdf_bytes).decode("utf-8")
+    Returns (Part, routing profile, near-duplicate plan). The Part holds only
+    the pages in `plan.changed_pages`, page-tagged so the extraction can be
+    stored per page, and it is None when nothing is left to extract.
+    """
+    from google.genai import types
+
+    ext = os.path.splitext(path)[1].lower()
+    scope = neardup.scope_of(path)
+    if ext in [".docx", ".txt", ".md"]:
+        if ext == ".docx":
+            text = read_docx(path)
+        else:
+            with open_document(path) as buf:
+                text = decode_text(buf)
+        pages = neardup.text_pages(text)
+        plan = neardup.plan(neardup.content_id(text.encode("utf-8")), scope, lambda: pages)
+        if plan.reusing and not plan.changed_pages:
+            return None, None, plan
+        text = neardup.tag_pages([pages[n - 1] for n in plan.changed_pages])
+        return types.Part.from_text(text=text), routing.profile_text(text, ext), plan
+    if ext == ".pdf":
+        # raw bytes go to the SDK; base64 happens only in its transport layer.
+        # Hashing and page parsing read the (possibly memory-mapped) buffer in
+        # place; bytes are copied only for the Part that is actually sent.
+        with open_document(path) as buf:
+            page_texts = []
+
+            def load_pages():
+                page_texts.extend(pdf_page_texts(buf))
+                return page_texts
+
+            plan = neardup.plan(neardup.content_id(buf), scope, load_pages)
+            if plan.reusing:
+                if not plan.changed_pages:
+                    return None, None, plan
+                data = select_pdf_pages(buf, plan.changed_pages)
+                profile = routing.profile_pdf(data, ext)
+            else:
+                # full extraction: profile from the page texts instead of parsing again
+                profile = routing.profile_pdf_pages(page_texts, len(buf), ext)
+                data = as_bytes(buf)
+        return types.Part.from_bytes(data=data, mime_type="application/pdf"), profile, plan
+    raise ValueError(f"Unsupported file type: {ext}")
  
  
-def read_text_from_file(paths: str) -> str:
+async def read_text_from_file(paths: str) -> str:
     """Accept a single path or comma-separated paths. Read each file
     (local or GCS) and concatenate their textual content.
  
-    Returns a summary generated by the model for the combined content.
+    Each document is opened, extracted and released before the next one so
+    only one raw document is resident at a time. Near-duplicates of earlier
+    uploads to the same project reuse the extractions of their unchanged
+    pages and only the changed pages are extracted.
+    The per-file extractions are compacted to SUMMARY_TOKEN_BUDGET before they
+    reach SummaryAgent.
     """
     parts = [p.strip() for p in paths.split(",") if p.strip()]
     if not parts:
         raise ValueError("No paths provided to read_text_from_file")
  
-    aggregated_texts = []
+    extracted_texts = []
     for p in parts:
-        ext = os.path.splitext(p)[1].lower()
-        if ext == ".docx":
-            text = read_docx(p)
-            msg1_document1 = types.Part.from_text(text=text)
-            aggregated_texts.append(msg1_document1)
-        elif ext in [".txt", ".md"]:
-            if _is_local_path(p):
-                with open(p, "r", encoding="utf-8") as f:
-                    aggregated_texts.append(f.read())
-            else:
-                data = _download_bytes_from_gcs_path(p)
-                try:
-                    msg1_document1 = types.Part.from_text(text=data.decode("utf-8"))
-                    aggregated_texts.append(msg1_document1)
-                except Exception:
-                    aggregated_texts.append(data.decode("latin-1", errors="ignore"))
-        elif ext == ".pdf":
-            # include a short preview of the PDF (base64 truncated) so the model can use it
-            b64 = read_pdf_as_base64(p)
-            msg = types.Part.from_bytes(
-                data=b64,
-                mime_type="application/pdf",
-            )
-            # ## Adding page by page base64 content
-            # for chunk in [b64[i : i + 5000] for i in range(0, len(b64), 5000)]:
-            #     msg_chunk = types.Part.from_bytes(
-            #         data=chunk,
-            #         mime_type="application/pdf",
-            #     )
-            #     aggregated_texts.append(msg_chunk)
+        # blocking download/parse/lookup stays off the event loop
+        content, profile, plan = await asyncio.to_thread(_load_part, p)
+        # None when every page is reused and there is nothing to extract
+        fully_reused = content is None
+        extracted = (
+            await extract_text(content, profile, page_tagged=bool(plan.signatures))
+            if not fully_reused
+            else ""
+        )
+        del content
+        record_neardup_pages(
+            reused=len(plan.signatures) - len(plan.changed_pages) if plan.reusing else 0,
+            extracted=len(plan.changed_pages),
+        )
+        text, pages = neardup.combine(plan, extracted)
+        # an extraction that came back empty or too short is not kept
+        if fully_reused or routing.validate_output(extracted, None):
+            # also indexes a byte-identical copy under this project's folder
+            await asyncio.to_thread(neardup.remember, plan, text, pages)
+        extracted_texts.append(text)
+    with span("compaction", files=len(extracted_texts)):
+        return compact_texts(extracted_texts)
+ 
+ 
+async def extract_text(content, profile=None, page_tagged=False):
+    """Extract the key points of one document.
+ 
+    The model, thinking budget and output cap come from `routing` based on the
+    document profile; an output that fails validation escalates to the next,
+    stronger route. Without a profile the strongest route is used. With
+    `page_tagged` the points are grouped under [Page N] tags (see `neardup`).
+    """
+    from google.genai import types
 
-            aggregated_texts.append(msg)
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
-    extracted_text = ""
-    for text in aggregated_texts:
-        extracted_text = extracted_text + extract_text(text) + " "
-    # create a Part with the combined text and ask the model to summarise
-    return extracted_text
- 
- 
-def extract_text(content):
-    client = genai.Client(
-        vertexai=True,
-        api_key=environ["VEXTEX_API_KEY"],
-    )
- 
-    model = "gemini-3-pro-preview"
+    client = get_genai_client()
+    instruction = "Extract all the points in concise manner."
+    if page_tagged:
+        instruction = f"{instruction} {neardup.PAGE_TAG_INSTRUCTION}"
     contents = [
         types.Content(
             role="user",
-            parts=[content, types.Part.from_text(text="""Extract all the points in concise manner.""")],
+            parts=[content, types.Part.from_text(text=instruction)],
         ),
     ]
  
-    generate_content_config = types.GenerateContentConfig(
-        temperature=1,
-        top_p=0.95,
-        seed=0,
-        max_output_tokens=65535,
-        safety_settings=[
-            types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
-            types.SafetySetting(
-                category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"
-            ),
-            types.SafetySetting(
-                category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"
+    async def generate(route, signal):
+        generate_content_config = types.GenerateContentConfig(
+            temperature=1,
+            top_p=0.95,
+            seed=0,
+            max_output_tokens=route.max_output_tokens,
+            safety_settings=[
+                types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
+                types.SafetySetting(
+                    category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"
+                ),
+                types.SafetySetting(
+                    category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"
+                ),
+                types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
+            ],
+            thinking_config=types.ThinkingConfig(
+                thinking_budget=route.thinking_budget,
             ),
-            types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
-        ],
-        thinking_config=types.ThinkingConfig(
-            thinking_budget=-1,
-        ),
-    )
-    summarized_text = ""
-    for chunk in client.models.generate_content_stream(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    ):
-        summarized_text = summarized_text + chunk.text + " "
-    return summarized_text
+        )
+        signal.started.set()
+        summarized_text = ""
+        usage = None
+        finish_reason = None
+        with span("extract_text", model=route.model, route=route.name):
+            async for chunk in await client.aio.models.generate_content_stream(
+                model=route.model,
+                contents=contents,
+                config=generate_content_config,
+            ):
+                signal.first_token.set()
+                # chunks carry their own whitespace; an added separator could
+                # split a [Page N] tag that spans two chunks
+                summarized_text = summarized_text + (chunk.text or "")
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                for candidate in getattr(chunk, "candidates", None) or []:
+                    finish_reason = candidate.finish_reason or finish_reason
+        record_tokens(route.model, usage, route=route.name)
+        return summarized_text, finish_reason
+ 
+    chain = routing.escalation_chain(routing.choose_route(profile))
+    for route in chain:
+        start = time.perf_counter()
+        # gated by the shared per-model concurrency limit, retried on 429, and
+        # hedged when the first token is slow (extraction is idempotent)
+        text, finish_reason = await get_hedger(f"extract_text:{route.name}").run(
+            lambda signal: llm_admission.call(route.model, lambda: generate(route, signal))
+        )
+        valid = routing.validate_output(text, str(getattr(finish_reason, "value", finish_reason or "")))
+        record_route(route.name, route.model, time.perf_counter() - start, valid)
+        if valid or route is chain[-1]:
+            return text
+    return text
  
  
 # Agent 1: Summary Generator
 # The output will be placed in the SequentialAgent's result under the key 'summary_text'.
-summary_agent = LlmAgent(
-    name="SummaryAgent",
-    model="gemini-2.0-flash",
-    instruction="""
+SUMMARY_INSTRUCTION = """
     You are a startup analyst. You will be provided with a document path.
     First, use the read_text_from_file tool to read the document content.
     Then summarize the document precisely.
  
     Output only a concise, professional summary paragraph.
-    """,
-    description="Summarizes startup-related content into key insights.",
-    output_key="summary_text",
-    tools=[read_text_from_file],
-)
+    """
  
 # Agent 2: Business Model Canvas (BMC) Generator
 # The input for this agent comes from the output of the previous agent ({summary_text}).
-bmc_agent = LlmAgent(
-    name="BmcAgent",
-    model="gemini-2.0-flash",
-    instruction="""
+BMC_INSTRUCTION = """
         You are an expert business consultant.
         Analyze the project specification provided in the state as 'project_spec'.
  
@@ -240,51 +226,80 @@ bmc_agent = LlmAgent(
  
         Each item should be a concise string (1-2 sentences max).
         Return ONLY valid JSON (no markdown, no commentary).
-        """,
-    description="Generates Business Model Canvas JSON from summary.",
-    output_key="bmc_json",
-)
+        """
  
  
-# The sequential agent defines the overall flow: SummaryAgent runs first,
-bmc_pipeline_agent = SequentialAgent(
-    name="BmcPipelineAgent",
-    sub_agents=[summary_agent, bmc_agent],
-    description="Summarizes document and generates Business Model Canvas in JSON format.",
-)
-root_agent = bmc_pipeline_agent
+@lru_cache(maxsize=None)
+def get_bmc_pipeline_agent():
+    """Build the SummaryAgent -> BmcAgent pipeline once, on first use."""
+    from google.adk.agents import LlmAgent, SequentialAgent
+
+    summary_agent = LlmAgent(
+        name="SummaryAgent",
+        model="gemini-2.0-flash",
+        instruction=SUMMARY_INSTRUCTION,
+        description="Summarizes startup-related content into key insights.",
+        output_key="summary_text",
+        tools=[read_text_from_file],
+        before_model_callback=llm_admission.before_model_callback,
+        after_model_callback=llm_admission.after_model_callback,
+    )
+    bmc_agent = LlmAgent(
+        name="BmcAgent",
+        model="gemini-2.0-flash",
+        instruction=BMC_INSTRUCTION,
+        description="Generates Business Model Canvas JSON from summary.",
+        output_key="bmc_json",
+        before_model_callback=llm_admission.before_model_callback,
+        after_model_callback=llm_admission.after_model_callback,
+    )
+    # The sequential agent defines the overall flow: SummaryAgent runs first,
+    return SequentialAgent(
+        name="BmcPipelineAgent",
+        sub_agents=[summary_agent, bmc_agent],
+        description="Summarizes document and generates Business Model Canvas in JSON format.",
+    )
  
  
-APP_NAME = "ai_analyst"
-USER_ID = "1234"
-SESSION_ID = "session1234"
+def __getattr__(name):
+    # ADK tooling (adk web/run) looks up `root_agent`; build it lazily.
+    if name in ("root_agent", "bmc_pipeline_agent"):
+        return get_bmc_pipeline_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
  
  
-async def bmc_main(file_urls):
-    session_service = InMemorySessionService()
-    session = await session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID
-    )
-    runner = Runner(
-        agent=bmc_pipeline_agent, app_name=APP_NAME, session_service=session_service
-    )
+async def _run_bmc_pipeline(file_urls):
+    from google.genai import types
+
+    pipeline_agent = get_bmc_pipeline_agent()
+    runner = get_runner(get_bmc_pipeline_agent)
     raw = []
-    async for event in runner.run_async(
-        user_id=session.user_id,
-        session_id=session.id,
-        new_message=types.Content(
-            role="user",
-            parts=[types.Part(text=file_urls)],
-        ),
-    ):
-        if (
-            hasattr(event, "is_final_response")
-            and event.is_final_response()
-            and getattr(event, "content", None)
+    # per-agent stage timings (SummaryAgent, BmcAgent) from the event stream
+    timer = AgentStageTimer({a.name: a.model for a in pipeline_agent.sub_agents})
+    async with agent_session() as session:
+        async for event in runner.run_async(
+            user_id=session.user_id,
+            session_id=session.id,
+            new_message=types.Content(
+                role="user",
+                parts=[types.Part(text=file_urls)],
+            ),
         ):
-            part = [part.text for part in event.content.parts]
-            raw.extend(part)
+            timer.on_event(event)
+            if (
+                hasattr(event, "is_final_response")
+                and event.is_final_response()
+                and getattr(event, "content", None)
+            ):
+                part = [part.text for part in event.content.parts]
+                raw.extend(part)
+    timer.finish()
    
     parsed = safe_load_json(raw[-1])
  
-    return parsed
\ No newline at end of file
+    return parsed
+
+
+async def bmc_main(file_urls):
+    # fresh session per attempt; model calls inside are gated by llm_admission
+    return await llm_admission.run_agent(lambda: _run_bmc_pipeline(file_urls))
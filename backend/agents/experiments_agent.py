@@ -1,19 +1,16 @@
 ## Google Libraries
 import json
-from google.adk.agents import LlmAgent
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.genai import types
+import logging
+from functools import lru_cache
+import llm_admission
+from agent_runtime import get_runner, session as agent_session
+from hedging import get_hedger
+from telemetry import AgentStageTimer
 
-APP_NAME = "ai_analyst"
-USER_ID = "1234"
-SESSION_ID = "session1234"
+logger = logging.getLogger(__name__)
 
 # --- Agent 2: Experiment Designer ---
-experiment_agent = LlmAgent(
-    name="ExperimentAgent",
-    model="gemini-2.0-flash",
-    instruction="""
+AGENT_INSTRUCTION = """
     You are an experimentation designer.
     
     You will receive the hypotheses JSON from the user message.
@@ -35,10 +32,23 @@ experiment_agent = LlmAgent(
 
     Return ONLY valid JSON with an "experiments" array.
     No markdown, no commentary.
-    """,
-    description="Designs experiments to test hypotheses",
-    output_key="experiments_json",
-)
+    """
+
+
+@lru_cache(maxsize=None)
+def get_experiment_agent():
+    """Build the ExperimentAgent once, on first use."""
+    from google.adk.agents import LlmAgent
+
+    return LlmAgent(
+        name="ExperimentAgent",
+        model="gemini-2.0-flash",
+        instruction=AGENT_INSTRUCTION,
+        description="Designs experiments to test hypotheses",
+        before_model_callback=llm_admission.before_model_callback,
+        after_model_callback=llm_admission.after_model_callback,
+        output_key="experiments_json",
+    )
 
 
 def safe_load_json(s: str):
@@ -48,26 +58,11 @@ def safe_load_json(s: str):
     return json.loads(s)
 
 
-async def experiments_main(hypotheses_data):
-    session_service = InMemorySessionService()
-    runner = Runner(
-        agent=experiment_agent,
-        app_name=APP_NAME,
-        session_service=session_service,
-    )
-
-    # Create session
-    session = await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-    )
-
-    # Save hypotheses into state (not used by LLM directly)
-    session.state["hypotheses_json"] = hypotheses_data
+async def _run_experiment_agent(hypotheses_data, signal=None):
+    from google.genai import types
 
-    print("\nDEBUG: Hypotheses stored in session state:\n",
-          session.state.get("hypotheses_json"))
+    agent = get_experiment_agent()
+    runner = get_runner(get_experiment_agent)
 
     # ---- FIXED: Pass hypotheses JSON explicitly to LLM ----
     llm_message = types.Content(
@@ -84,18 +79,39 @@ async def experiments_main(hypotheses_data):
 
     # Stream LLM events
     final_event = None
-
-    async for event in runner.run_async(
-        user_id=session.user_id,
-        session_id=session.id,
-        new_message=llm_message,
-    ):
-        print("DEBUG EVENT:", event)
-        if hasattr(event, "is_final_response") and event.is_final_response():
-            final_event = event
-            break
+    timer = AgentStageTimer({agent.name: agent.model})
+
+    # hypotheses_json kept in session state (not used by LLM directly)
+    async with agent_session({"hypotheses_json": hypotheses_data}) as session:
+        async for event in runner.run_async(
+            user_id=session.user_id,
+            session_id=session.id,
+            new_message=llm_message,
+        ):
+            timer.on_event(event)
+            if signal is not None:
+                signal.first_token.set()
+            logger.debug(
+                "agent event author=%s final=%s",
+                getattr(event, "author", None),
+                event.is_final_response(),
+            )
+            if hasattr(event, "is_final_response") and event.is_final_response():
+                final_event = event
+                break
+    timer.finish()
 
     raw = [part.text for part in final_event.content.parts]
     parsed = safe_load_json(raw[0])
 
-    return parsed
\ No newline at end of file
+    return parsed
+
+
+async def experiments_main(hypotheses_data):
+    # fresh session per attempt; model calls inside are gated by llm_admission;
+    # generation is idempotent, so a slow first response may be hedged
+    return await get_hedger("experiments").run(
+        lambda signal: llm_admission.run_agent(
+            lambda: _run_experiment_agent(hypotheses_data, signal), on_admitted=signal.started.set
+        )
+    )
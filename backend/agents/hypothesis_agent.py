@@ -1,20 +1,17 @@
 ## Google Libraries
 import json
+import logging
 import os
-from google.adk.agents import LlmAgent
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.genai import types
+from functools import lru_cache
+import llm_admission
+from agent_runtime import get_runner, session as agent_session
+from hedging import get_hedger
+from telemetry import AgentStageTimer
 
-APP_NAME = "ai_analyst"
-USER_ID = "1234"
-SESSION_ID = "session1234"
+logger = logging.getLogger(__name__)
 
 # --- Agent 2: Hypothesis Generator ---
-hypothesis_agent = LlmAgent(
-    name="HypothesisAgent",
-    model="gemini-2.0-flash",
-    instruction="""
+AGENT_INSTRUCTION = """
     You are a business validation expert.
 
     You will receive the Business Model Canvas (BMC) JSON from the user message.
@@ -33,10 +30,23 @@ hypothesis_agent = LlmAgent(
 
     Return ONLY valid JSON with a top-level "hypotheses" array.
     No markdown, no commentary.
-    """,
-    description="Generates testable hypotheses from BMC",
-    output_key="hypotheses_json",
-)
+    """
+
+
+@lru_cache(maxsize=None)
+def get_hypothesis_agent():
+    """Build the HypothesisAgent once, on first use."""
+    from google.adk.agents import LlmAgent
+
+    return LlmAgent(
+        name="HypothesisAgent",
+        model="gemini-2.0-flash",
+        instruction=AGENT_INSTRUCTION,
+        description="Generates testable hypotheses from BMC",
+        before_model_callback=llm_admission.before_model_callback,
+        after_model_callback=llm_admission.after_model_callback,
+        output_key="hypotheses_json",
+    )
 
 def safe_load_json(s: str):
     """Safely parse JSON from LLM response."""
@@ -45,25 +55,11 @@ def safe_load_json(s: str):
     return json.loads(s)
 
 
-async def hypotheses_main(bmc_data):
-    session_service = InMemorySessionService()
-    runner = Runner(
-        agent=hypothesis_agent,
-        app_name=APP_NAME,
-        session_service=session_service,
-    )
-
-    # Create session
-    session = await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-    )
-
-    # Store into state (not required for LLM, but safe)
-    session.state["bmc_json"] = bmc_data
+async def _run_hypothesis_agent(bmc_data, signal=None):
+    from google.genai import types
 
-    print("\nDEBUG: BMC stored in session state:\n", session.state.get("bmc_json"))
+    agent = get_hypothesis_agent()
+    runner = get_runner(get_hypothesis_agent)
 
     # ---- FIXED: Pass BMC JSON explicitly to LLM ----
     llm_message = types.Content(
@@ -80,18 +76,39 @@ async def hypotheses_main(bmc_data):
 
     # Stream the response
     final_event = None
-    async for event in runner.run_async(
-        user_id=session.user_id,
-        session_id=session.id,
-        new_message=llm_message,
-    ):
-        print("DEBUG EVENT:", event)
-        if hasattr(event, "is_final_response") and event.is_final_response():
-            final_event = event
-            break
+    timer = AgentStageTimer({agent.name: agent.model})
+    # bmc_json kept in session state (not required for LLM, but safe)
+    async with agent_session({"bmc_json": bmc_data}) as session:
+        async for event in runner.run_async(
+            user_id=session.user_id,
+            session_id=session.id,
+            new_message=llm_message,
+        ):
+            timer.on_event(event)
+            if signal is not None:
+                signal.first_token.set()
+            logger.debug(
+                "agent event author=%s final=%s",
+                getattr(event, "author", None),
+                event.is_final_response(),
+            )
+            if hasattr(event, "is_final_response") and event.is_final_response():
+                final_event = event
+                break
+    timer.finish()
 
     # Extract raw LLM text
     raw = [part.text for part in final_event.content.parts]
     parsed = safe_load_json(raw[0])
 
-    return parsed
\ No newline at end of file
+    return parsed
+
+
+async def hypotheses_main(bmc_data):
+    # fresh session per attempt; model calls inside are gated by llm_admission;
+    # generation is idempotent, so a slow first response may be hedged
+    return await get_hedger("hypotheses").run(
+        lambda signal: llm_admission.run_agent(
+            lambda: _run_hypothesis_agent(bmc_data, signal), on_admitted=signal.started.set
+        )
+    )
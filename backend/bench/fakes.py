@@ -0,0 +1,447 @@
+"""Local stand-ins for GCS, BigQuery and Gemini used by the benchmark harness.
+
+Only the surface that main_app and the agents actually touch is implemented.
+"""
+
+## Standard Libraries
+import asyncio
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+## Google Libraries
+from google.api_core.exceptions import NotFound
+
+
+# ================= In-memory GCS =================
+class FakeBlob:
+    def __init__(self, store: Dict[str, bytes], bucket_name: str, name: str):
+        self._store = store
+        self._key = f"{bucket_name}/{name}"
+        self.name = name
+        self.content_type = None
+
+    @property
+    def size(self) -> Optional[int]:
+        data = self._store.get(self._key)
+        return None if data is None else len(data)
+
+    def upload_from_string(self, data, content_type=None):
+        self._store[self._key] = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        self.content_type = content_type
+
+    def upload_from_file(self, file_obj, content_type=None, rewind=False):
+        if rewind:
+            file_obj.seek(0)
+        self.upload_from_string(file_obj.read(), content_type=content_type)
+
+    def download_as_bytes(self) -> bytes:
+        if self._key not in self._store:
+            raise NotFound(self._key)
+        return self._store[self._key]
+
+    def download_to_file(self, file_obj):
+        file_obj.write(self.download_as_bytes())
+
+
+class FakeBucket:
+    def __init__(self, store: Dict[str, bytes], name: str):
+        self._store = store
+        self.name = name
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self._store, self.name, name)
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        blob = self.blob(name)
+        return blob if blob.size is not None else None
+
+    def list_blobs(self, prefix: str = ""):
+        head = f"{self.name}/{prefix}"
+        return [
+            self.blob(key[len(self.name) + 1 :])
+            for key in list(self._store)
+            if key.startswith(head)
+        ]
+
+
+class FakeStorageClient:
+    """Drop-in for google.cloud.storage.Client backed by a shared dict."""
+
+    store: Dict[str, bytes] = {}
+
+    def __init__(self, project=None, credentials=None):
+        self.project = project
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self.store, name)
+
+
+# ================= SQLite-backed BigQuery =================
+class _Row(dict):
+    """Row supporting both dict(row) and attribute access (row.cnt)."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+
+class _Job:
+    def __init__(self, rows: List[_Row]):
+        self._rows = rows
+
+    def result(self):
+        return iter(self._rows)
+
+
+class FakeBigQueryClient:
+    """Drop-in for google.cloud.bigquery.Client over a single SQLite database.
+
+    Table ids `project.dataset.table` map to SQLite tables `dataset__table`;
+    `@param` placeholders map to SQLite named parameters. Every call counts as
+    one BigQuery job in `jobs`.
+    """
+
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    lock = threading.Lock()
+    datasets = set()
+    # sqlite table -> last write time (ms), exposed as Table.modified
+    modified: Dict[str, int] = {}
+    jobs = 0
+    latency_s = 0.0
+
+    def __init__(self, project=None, credentials=None):
+        self.project = project
+
+    @classmethod
+    def reset(cls, latency_s: float = 0.0):
+        cls.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        cls.datasets = set()
+        cls.modified = {}
+        cls.jobs = 0
+        cls.latency_s = latency_s
+
+    @staticmethod
+    def _sqlite_name(table_id: str) -> str:
+        parts = str(table_id).split(".")
+        return "__".join(parts[-2:])
+
+    def _touch(self, name: str):
+        self.modified[name] = int(time.time() * 1000)
+
+    def _job(self):
+        type(self).jobs += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def get_dataset(self, dataset_id):
+        self._job()
+        if str(dataset_id) not in self.datasets:
+            raise NotFound(str(dataset_id))
+
+    def create_dataset(self, dataset, exists_ok=False):
+        self._job()
+        self.datasets.add(f"{dataset.project}.{dataset.dataset_id}")
+
+    def get_table(self, table_id):
+        from google.cloud import bigquery
+
+        self._job()
+        name = self._sqlite_name(table_id)
+        with self.lock:
+            cols = [r[1] for r in self.conn.execute(f'PRAGMA table_info("{name}")')]
+            num_rows = self.conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] if cols else 0
+        if not cols:
+            raise NotFound(str(table_id))
+        table = bigquery.Table(table_id, schema=[bigquery.SchemaField(c, "STRING") for c in cols])
+        table._properties["numRows"] = str(num_rows)
+        if name in self.modified:
+            table._properties["lastModifiedTime"] = str(self.modified[name])
+        return table
+
+    def update_table(self, table, fields):
+        self._job()
+        name = self._sqlite_name(f"{table.project}.{table.dataset_id}.{table.table_id}")
+        with self.lock:
+            existing = {r[1] for r in self.conn.execute(f'PRAGMA table_info("{name}")')}
+            for f in table.schema:
+                if f.name not in existing:
+                    self.conn.execute(f'ALTER TABLE "{name}" ADD COLUMN "{f.name}" TEXT')
+            self.conn.commit()
+        return table
+
+    def create_table(self, table):
+        self._job()
+        name = self._sqlite_name(f"{table.project}.{table.dataset_id}.{table.table_id}")
+        cols = ", ".join(f'"{f.name}" TEXT' for f in table.schema)
+        with self.lock:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({cols})')
+
+    def insert_rows_json(self, table_id, rows):
+        self._job()
+        name = self._sqlite_name(table_id)
+        with self.lock:
+            existing = {r[1] for r in self.conn.execute(f'PRAGMA table_info("{name}")')}
+            for row in rows:
+                for col in row:
+                    if col not in existing:
+                        self.conn.execute(f'ALTER TABLE "{name}" ADD COLUMN "{col}" TEXT')
+                        existing.add(col)
+                cols = ", ".join(f'"{c}"' for c in row)
+                marks = ", ".join("?" for _ in row)
+                self.conn.execute(
+                    f'INSERT INTO "{name}" ({cols}) VALUES ({marks})', list(row.values())
+                )
+            self.conn.commit()
+            self._touch(name)
+        return []
+
+    def _merge(self, sql, job_config):
+        """The `MERGE ... USING UNNEST(@rows)` shape issued by bulk_upsert."""
+        target = self._sqlite_name(re.search(r"MERGE `([^`]+)`", sql).group(1))
+        key_col, key_alias = re.search(r"ON T\.`([^`]+)` = S\.(\w+)", sql).groups()
+        insert_cols = re.findall(r"`([^`]+)`", sql.split("INSERT", 1)[1])
+        insert_aliases = re.findall(r"S\.(\w+)", sql.split("VALUES", 1)[1])
+        mapping = dict(zip(insert_aliases, insert_cols))
+        (rows_param,) = job_config.query_parameters
+        with self.lock:
+            for struct in rows_param.values:
+                row = {mapping[a]: v for a, v in struct.struct_values.items()}
+                quoted = [f'"{c}"' for c in row]
+                cur = self.conn.execute(
+                    f'UPDATE "{target}" SET {", ".join(f"{q} = ?" for q in quoted)} WHERE "{key_col}" = ?',
+                    [*row.values(), struct.struct_values[key_alias]],
+                )
+                if cur.rowcount == 0:
+                    self.conn.execute(
+                        f'INSERT INTO "{target}" ({", ".join(quoted)}) VALUES ({", ".join("?" for _ in row)})',
+                        list(row.values()),
+                    )
+            self.conn.commit()
+            self._touch(target)
+        return _Job([])
+
+    def query(self, sql, job_config=None):
+        self._job()
+        if sql.lstrip().startswith("MERGE"):
+            return self._merge(sql, job_config)
+        sql = re.sub(
+            r"`([\w-]+\.[\w-]+\.[\w-]+)`",
+            lambda m: f'"{self._sqlite_name(m.group(1))}"',
+            sql,
+        )
+        sql = re.sub(r"`([^`]+)`", r'"\1"', sql)
+        sql = re.sub(r"@(\w+)", r":\1", sql)
+        params = {}
+        if job_config is not None:
+            params = {p.name: p.value for p in job_config.query_parameters}
+        with self.lock:
+            cur = self.conn.execute(sql, params)
+            cols = [c[0] for c in cur.description or []]
+            rows = [_Row(zip(cols, r)) for r in cur.fetchall()]
+            self.conn.commit()
+            if not sql.lstrip().upper().startswith("SELECT"):
+                for name in re.findall(r'^\s*\w+\s+(?:INTO\s+|FROM\s+)?"([^"]+)"', sql):
+                    self._touch(name)
+        return _Job(rows)
+
+
+# ================= Scripted LLM =================
+class FakeRateLimitError(Exception):
+    """Shaped like google.genai.errors.ClientError for a 429."""
+
+    code = 429
+
+    def __init__(self):
+        super().__init__("429 RESOURCE_EXHAUSTED. Quota exceeded (scripted)")
+
+
+class ScriptedLLM:
+    """Shared knobs for the fake Gemini backends."""
+
+    latency_s = 0.05
+    output_tokens = 200
+    # fraction of calls that fail with a scripted 429
+    rate_limit_ratio = 0.0
+    # fraction of calls that stall for tail_latency_s (to exercise hedging)
+    tail_ratio = 0.0
+    tail_latency_s = 2.0
+    calls = 0
+
+    @classmethod
+    def latency(cls) -> float:
+        if cls.tail_ratio and random.random() < cls.tail_ratio:
+            return cls.tail_latency_s
+        return cls.latency_s
+
+    @classmethod
+    def maybe_rate_limit(cls):
+        if cls.rate_limit_ratio and random.random() < cls.rate_limit_ratio:
+            raise FakeRateLimitError()
+
+    @classmethod
+    def text(cls) -> str:
+        return " ".join(f"point{i}" for i in range(cls.output_tokens))
+
+
+# characters per streamed chunk
+CHUNK_CHARS = 300
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeModels:
+    def generate_content_stream(self, model, contents, config=None):
+        ScriptedLLM.calls += 1
+        time.sleep(ScriptedLLM.latency_s)
+        text = ScriptedLLM.text()
+        # like the real stream, chunks end anywhere, even inside a word
+        for i in range(0, len(text), CHUNK_CHARS):
+            yield _Chunk(text[i : i + CHUNK_CHARS])
+
+    def generate_content(self, model, contents, config=None):
+        return _Chunk("".join(c.text for c in self.generate_content_stream(model, contents, config)))
+
+
+class _FakeAsyncModels:
+    async def generate_content_stream(self, model, contents, config=None):
+        ScriptedLLM.calls += 1
+        await asyncio.sleep(ScriptedLLM.latency())
+        ScriptedLLM.maybe_rate_limit()
+        text = ScriptedLLM.text()
+
+        async def stream():
+            for i in range(0, len(text), CHUNK_CHARS):
+                yield _Chunk(text[i : i + CHUNK_CHARS])
+
+        return stream()
+
+
+class FakeGenaiClient:
+    """Drop-in for google.genai.Client (sync `models` and async `aio.models`)."""
+
+    def __init__(self, *args, **kwargs):
+        self.models = _FakeModels()
+        self.aio = type("aio", (), {"models": _FakeAsyncModels()})()
+
+
+BMC_RESPONSE = {
+    key: [f"{key} item {i}" for i in range(3)]
+    for key in [
+        "key-partners",
+        "key-activities",
+        "key-resources",
+        "value-propositions",
+        "customer-relationships",
+        "channels",
+        "customer-segments",
+        "cost-structure",
+        "revenue-streams",
+    ]
+}
+HYPOTHESES_RESPONSE = {
+    "hypotheses": [
+        {
+            "category": "value-propositions",
+            "hypothesis": f"Hypothesis {i}",
+            "risk_weight": 20,
+            "type": "AI Suggested",
+            "ai_doable": "Yes" if i % 2 else "No",
+        }
+        for i in range(5)
+    ]
+}
+EXPERIMENTS_RESPONSE = {
+    "experiments": [
+        {
+            "hypothesis": f"Hypothesis {i}",
+            "experiment_type": "Discovery",
+            "ai_confidence": 80,
+            "experiment_name": f"Experiment {i}",
+            "priority": ["High", "Medium", "Low"][i % 3],
+            "ai_doable": "Yes",
+        }
+        for i in range(5)
+    ]
+}
+AGENT_RESPONSES = {
+    "BmcPipelineAgent": BMC_RESPONSE,
+    "HypothesisAgent": HYPOTHESES_RESPONSE,
+    "ExperimentAgent": EXPERIMENTS_RESPONSE,
+}
+
+
+class _LlmRequest:
+    def __init__(self, model: str):
+        self.model = model
+
+
+class _Content:
+    def __init__(self, text: str):
+        self.parts = [_Chunk(text)]
+
+
+class _Event:
+    def __init__(self, author: str, text: str):
+        self.author = author
+        self.content = _Content(text)
+
+    def is_final_response(self):
+        return True
+
+
+class ScriptedRunner:
+    """Drop-in for google.adk.runners.Runner.
+
+    For the BMC pipeline the document tool is executed for real (against the
+    fake GCS and scripted Gemini client) before the canned BMC is returned, so
+    the benchmark covers download, extraction and compaction. The agent's
+    model callbacks run around the scripted call, as they would in ADK.
+    """
+
+    def __init__(self, agent, app_name=None, session_service=None, **kwargs):
+        self.agent = agent
+
+    async def run_async(self, user_id, session_id, new_message):
+        name = self.agent.name
+        if name == "BmcPipelineAgent":
+            from agents.bmc_agent import read_text_from_file
+
+            await read_text_from_file(new_message.parts[0].text)
+        llm_agent = (getattr(self.agent, "sub_agents", None) or [self.agent])[-1]
+        request = _LlmRequest(llm_agent.model)
+        if llm_agent.before_model_callback:
+            await llm_agent.before_model_callback(callback_context=None, llm_request=request)
+        ScriptedLLM.calls += 1
+        await asyncio.sleep(ScriptedLLM.latency())
+        ScriptedLLM.maybe_rate_limit()
+        event = _Event(name, json.dumps(AGENT_RESPONSES[name]))
+        if llm_agent.after_model_callback:
+            await llm_agent.after_model_callback(callback_context=None, llm_response=event)
+        yield event
+
+
+FAKE_ENV: Dict[str, Any] = {
+    "PROJECT_ID": "bench-project",
+    "PROJECT_ID_SA": "bench-project",
+    "PRIVATE_KEY_ID": "bench",
+    "PRIVATE_KEY": "bench",
+    "CLIENT_EMAIL": "bench@example.com",
+    "CLIENT_ID": "0",
+    "CLIENT_X509_CERT_URL": "https://example.com",
+    "VEXTEX_API_KEY": "bench",
+    "GCS_BUCKET": "hackathon-data-bucket-001",
+    "BQ_DATASET": "bench",
+    # every concurrency level replays the same payloads; without this the
+    # later levels would be served from the previous level's coalesced results
+    "COALESCE_WINDOW_S": "0",
+}
@@ -0,0 +1,403 @@
+"""Offline end-to-end benchmark for the FastAPI backend.
+
+Runs the real app in-process against local stand-ins (bench/fakes.py) for
+GCS, BigQuery and Gemini, so no Google credentials or network are needed.
+
+Usage (from backend/):
+    pip install -r requirements.txt -r bench/requirements.txt
+    python -m bench.run                                # compare with bench/baseline.json
+    python -m bench.run --update-baseline              # record a new baseline
+    python -m bench.run --concurrency 1,8,32 --requests 64 --llm-latency 0.2
+
+Exits 1 when any scenario's p95 latency or throughput regresses by more than
+--tolerance against the stored baseline, and 2 when there is no baseline or it
+was recorded with different workload knobs (endpoints, concurrency, requests,
+repeats, fake latencies, document size); re-record it with --update-baseline.
+Each scenario runs --repeat times on fresh documents and the median run is
+reported; the baseline also keeps the worst p95 and throughput of its repeats,
+which is what results are compared against.
+"""
+
+## Standard Libraries
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+ENDPOINTS = [
+    "/run_bmc_pipeline",
+    "/run_hypotheses_agent",
+    "/run_experiments_agent",
+    "/get_all_data",
+    "/file_upload",
+]
+# projects per /run_portfolio_pipeline request (opt-in via --endpoints)
+PORTFOLIO_SIZE = 4
+# arguments that define the workload; a baseline only compares against the same values
+KNOBS = (
+    "endpoints",
+    "concurrency",
+    "requests",
+    "repeat",
+    "llm_latency",
+    "llm_tokens",
+    "llm_429_ratio",
+    "llm_tail_ratio",
+    "llm_tail_latency",
+    "bq_latency",
+    "doc_kb",
+)
+
+
+# ================= Fake wiring =================
+def install_fakes(args) -> Any:
+    """Patch the Google SDK entry points with local fakes and import the app."""
+    from bench import fakes
+
+    os.environ.update({k: v for k, v in fakes.FAKE_ENV.items() if k not in os.environ})
+
+    import google.genai
+    from google.adk import runners
+    from google.cloud import bigquery, storage
+    from google.oauth2 import service_account
+
+    patches = [
+        mock.patch.object(
+            service_account.Credentials,
+            "from_service_account_info",
+            return_value=mock.sentinel.credentials,
+        ),
+        mock.patch.object(storage, "Client", fakes.FakeStorageClient),
+        mock.patch.object(bigquery, "Client", fakes.FakeBigQueryClient),
+        mock.patch.object(google.genai, "Client", fakes.FakeGenaiClient),
+        mock.patch.object(runners, "Runner", fakes.ScriptedRunner),
+    ]
+    for p in patches:
+        p.start()
+
+    fakes.ScriptedLLM.latency_s = args.llm_latency
+    fakes.ScriptedLLM.output_tokens = args.llm_tokens
+    fakes.ScriptedLLM.rate_limit_ratio = args.llm_429_ratio
+    fakes.ScriptedLLM.tail_ratio = args.llm_tail_ratio
+    fakes.ScriptedLLM.tail_latency_s = args.llm_tail_latency
+    fakes.FakeBigQueryClient.reset(latency_s=args.bq_latency)
+
+    seed_documents(args)
+
+    import main_app
+
+    return main_app.app
+
+
+def seed_documents(args):
+    """Upload fresh documents for every project.
+
+    Called before each scenario: with the same bytes every concurrency level
+    after the first would reuse the previous level's extractions (neardup)
+    instead of measuring them.
+    """
+    from bench import fakes
+
+    bucket = fakes.FakeStorageClient().bucket(os.environ["GCS_BUCKET"])
+    for project_id in range(args.requests + PORTFOLIO_SIZE):
+        bucket.blob(f"{project_id}/deck.pdf").upload_from_string(
+            b"%PDF-1.4\n" + os.urandom(args.doc_kb * 1024)
+        )
+        bucket.blob(f"{project_id}/notes.md").upload_from_string(
+            "\n\n".join(
+                f"Note {i} ({os.urandom(4).hex()}): customers want faster onboarding." for i in range(200)
+            )
+        )
+
+
+# ================= Workloads =================
+def _bmc_request(i: int) -> Dict[str, Any]:
+    return {
+        "method": "POST",
+        "url": "/run_bmc_pipeline",
+        "json": {
+            "project_id": i,
+            "project_name": f"Project {i}",
+            "project_description": "Benchmark project",
+            "sector": "SaaS",
+            "funding_stage": "Seed",
+            "team_size": 5,
+            "project_document": "deck.pdf",
+            "file_names": "deck.pdf,notes.md",
+        },
+    }
+
+
+def _portfolio_request(i: int) -> Dict[str, Any]:
+    projects = [_bmc_request(i)["json"]]
+    for j in range(1, PORTFOLIO_SIZE):
+        projects.append({**projects[0], "project_id": i + j, "project_name": f"Project {i + j}"})
+    return {"method": "POST", "url": "/run_portfolio_pipeline", "json": {"projects": projects}}
+
+
+def _hypotheses_request(i: int) -> Dict[str, Any]:
+    from bench.fakes import BMC_RESPONSE
+
+    return {
+        "method": "POST",
+        "url": "/run_hypotheses_agent",
+        "json": {
+            "bmc_data": [BMC_RESPONSE],
+            "project_id": i,
+            "project_description": "Benchmark project",
+            "sector": "SaaS",
+        },
+    }
+
+
+def _experiments_request(i: int) -> Dict[str, Any]:
+    from bench.fakes import HYPOTHESES_RESPONSE
+
+    return {
+        "method": "POST",
+        "url": "/run_experiments_agent",
+        "json": {
+            "hypotheses": HYPOTHESES_RESPONSE["hypotheses"],
+            "project_id": i,
+            "project_description": "Benchmark project",
+            "sector": "SaaS",
+        },
+    }
+
+
+def _get_all_data_request(i: int) -> Dict[str, Any]:
+    return {"method": "GET", "url": "/get_all_data"}
+
+
+def _portfolio_summary_request(i: int) -> Dict[str, Any]:
+    return {"method": "GET", "url": "/portfolio_summary"}
+
+
+def _file_upload_request(i: int) -> Dict[str, Any]:
+    return {
+        "method": "POST",
+        "url": "/file_upload",
+        "data": {"project_id": str(i)},
+        "files": [("files", (f"upload-{i}.pdf", os.urandom(256 * 1024), "application/pdf"))],
+    }
+
+
+WORKLOADS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "/run_bmc_pipeline": _bmc_request,
+    "/run_hypotheses_agent": _hypotheses_request,
+    "/run_experiments_agent": _experiments_request,
+    "/get_all_data": _get_all_data_request,
+    "/file_upload": _file_upload_request,
+    "/run_portfolio_pipeline": _portfolio_request,
+    "/portfolio_summary": _portfolio_summary_request,
+}
+
+
+# ================= Measurement =================
+def _current_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+async def run_scenario(client, endpoint: str, concurrency: int, total: int) -> Dict[str, Any]:
+    build = WORKLOADS[endpoint]
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    peak_rss = _current_rss_kb()
+    sampling = True
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while sampling:
+            peak_rss = max(peak_rss, _current_rss_kb())
+            await asyncio.sleep(0.01)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            req = build(i)
+            start = time.perf_counter()
+            resp = await client.request(**req)
+            latencies.append(time.perf_counter() - start)
+            content_type = resp.headers.get("content-type", "")
+            if content_type.startswith("application/x-ndjson"):
+                lines = [json.loads(line) for line in resp.text.splitlines() if line]
+                body = next((line for line in lines if "error" in line), {})
+            else:
+                body = resp.json() if content_type.startswith("application/json") else {}
+            if resp.status_code >= 400 or (isinstance(body, dict) and "error" in body):
+                errors += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampling = False
+    await sampler
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+    }
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The median run (by p95) of a repeated scenario, plus the worst p95 and
+    throughput seen across the repeats (the noise envelope a baseline keeps)."""
+    ordered = sorted(runs, key=lambda r: r["p95_ms"])
+    result = dict(ordered[len(ordered) // 2])
+    result["repeats"] = len(runs)
+    result["worst_p95_ms"] = ordered[-1]["p95_ms"]
+    result["worst_throughput_rps"] = min(r["throughput_rps"] for r in runs)
+    result["errors"] = max(r["errors"] for r in runs)
+    return result
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float = 0.0
+) -> List[str]:
+    """Return a list of human-readable regressions against `baseline`.
+
+    Results are compared with the worst p95 / throughput the baseline saw
+    across its repeats. A p95 increase only counts when it is also above
+    `min_delta_ms`, so sub-millisecond jitter on fast endpoints does not fail
+    the gate.
+    """
+    regressions = []
+    for r in results:
+        key = f"{r['endpoint']}@{r['concurrency']}"
+        base = baseline.get(key)
+        if not base:
+            continue
+        base_p95 = base.get("worst_p95_ms", base["p95_ms"])
+        base_rps = base.get("worst_throughput_rps", base["throughput_rps"])
+        if r["p95_ms"] > base_p95 * (1 + tolerance) and r["p95_ms"] - base_p95 > min_delta_ms:
+            regressions.append(f"{key}: p95 {r['p95_ms']}ms > baseline {base_p95}ms")
+        if r["throughput_rps"] < base_rps * (1 - tolerance):
+            regressions.append(f"{key}: throughput {r['throughput_rps']}rps < baseline {base_rps}rps")
+        if r["errors"] > base.get("errors", 0):
+            regressions.append(f"{key}: {r['errors']} errors (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    import httpx
+
+    app = install_fakes(args)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                runs = []
+                for _ in range(args.repeat):
+                    seed_documents(args)
+                    runs.append(await run_scenario(client, endpoint, concurrency, args.requests))
+                result = summarize_runs(runs)
+                results.append(result)
+                print(
+                    f"{endpoint:<24} c={concurrency:<3} p50={result['p50_ms']:>8}ms "
+                    f"p95={result['p95_ms']:>8}ms p99={result['p99_ms']:>8}ms "
+                    f"rps={result['throughput_rps']:>7} rss={result['peak_rss_mb']}MB "
+                    f"errors={result['errors']}"
+                )
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), type=lambda s: s.split(","))
+    parser.add_argument("--concurrency", default="1,4,16", type=lambda s: [int(c) for c in s.split(",")])
+    parser.add_argument("--requests", default=32, type=int, help="requests per scenario")
+    parser.add_argument("--repeat", default=5, type=int, help="runs per scenario; the median run is reported")
+    parser.add_argument("--llm-latency", default=0.05, type=float, help="seconds per scripted LLM call")
+    parser.add_argument("--llm-tokens", default=200, type=int, help="tokens per scripted LLM response")
+    parser.add_argument("--llm-429-ratio", default=0.0, type=float, help="fraction of LLM calls failing with 429")
+    parser.add_argument("--llm-tail-ratio", default=0.0, type=float, help="fraction of LLM calls that stall")
+    parser.add_argument("--llm-tail-latency", default=2.0, type=float, help="seconds a stalled LLM call takes")
+    parser.add_argument("--bq-latency", default=0.0, type=float, help="seconds per fake BigQuery job")
+    parser.add_argument("--doc-kb", default=512, type=int, help="size of each seeded PDF")
+    parser.add_argument("--tolerance", default=0.2, type=float, help="allowed regression ratio")
+    parser.add_argument(
+        "--min-delta-ms", default=5.0, type=float, help="p95 increases below this are never regressions"
+    )
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(main_async(args))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    knobs = {k: getattr(args, k) for k in KNOBS}
+    if args.update_baseline:
+        baseline = {
+            "knobs": knobs,
+            "scenarios": {f"{r['endpoint']}@{r['concurrency']}": r for r in results},
+        }
+        baseline_path.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"ERROR: no baseline at {baseline_path}; run with --update-baseline to record one.")
+        return 2
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("knobs") != knobs:
+        print(f"ERROR: baseline at {baseline_path} was recorded with different knobs:")
+        for k in KNOBS:
+            if baseline.get("knobs", {}).get(k) != knobs[k]:
+                print(f"  {k}: baseline {baseline.get('knobs', {}).get(k)!r}, now {knobs[k]!r}")
+        return 2
+
+    regressions = compare(results, baseline["scenarios"], args.tolerance, args.min_delta_ms)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
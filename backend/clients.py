@@ -0,0 +1,67 @@
+"""Shared Google credentials and SDK clients, built once on first use.
+
+Nothing here touches the environment or imports a Google SDK at import time,
+so `main_app` can be imported (and Cloud Run can start listening) before any
+credentials exist. `startup.warm_up()` calls these eagerly when asked.
+"""
+
+## Standard Libraries
+from functools import lru_cache
+from os import environ
+
+
+@lru_cache(maxsize=None)
+def get_credentials():
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_info(
+        {
+            "type": "service_account",
+            "project_id": environ["PROJECT_ID_SA"],
+            "private_key_id": environ["PRIVATE_KEY_ID"],
+            "private_key": environ["PRIVATE_KEY"].replace("\\n", "\n"),
+            "client_email": environ["CLIENT_EMAIL"],
+            "client_id": environ["CLIENT_ID"],
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_x509_cert_url": environ["CLIENT_X509_CERT_URL"],
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def get_storage_client():
+    from google.cloud import storage
+
+    return storage.Client(
+        project=environ["PROJECT_ID_SA"],
+        credentials=get_credentials(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_bigquery_client():
+    from google.cloud import bigquery
+
+    return bigquery.Client(
+        project=environ["PROJECT_ID_SA"],
+        credentials=get_credentials(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_vision_client():
+    from google.cloud import vision
+
+    return vision.ImageAnnotatorClient(credentials=get_credentials())
+
+
+@lru_cache(maxsize=None)
+def get_genai_client():
+    from google import genai
+
+    return genai.Client(
+        vertexai=True,
+        api_key=environ["VEXTEX_API_KEY"],
+    )
@@ -0,0 +1,87 @@
+"""Single-flight coalescing of identical pipeline requests.
+
+Concurrent calls with the same key share one execution and all receive its
+result. A successful result (one without an "error" key) is also kept for
+COALESCE_WINDOW_S seconds so a double-click that lands just after the first
+run finished is served from it instead of starting a second LLM pipeline
+(and a second `update_table`).
+
+Across workers the run is claimed in `shared_state`; a worker that finds the
+key claimed elsewhere polls for the shared result instead of running it too,
+and runs it itself only if the owner gives up (fails or dies). Store calls
+run in a thread: under write contention between workers SQLite may wait for
+its lock, and that must not stall the event loop.
+"""
+
+## Standard Libraries
+import asyncio
+import hashlib
+import json
+from os import environ
+from typing import Any, Awaitable, Callable, Dict
+
+import shared_state
+from telemetry import record_cache
+
+COALESCE_WINDOW_S = float(environ.get("COALESCE_WINDOW_S", 10))
+# a claim older than this is assumed to belong to a dead worker
+COALESCE_JOB_TTL_S = float(environ.get("COALESCE_JOB_TTL_S", 900))
+COALESCE_POLL_S = float(environ.get("COALESCE_POLL_S", 0.25))
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a JSON-serializable request payload."""
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, window_s: float = COALESCE_WINDOW_S, namespace: str = "flight"):
+        self.window_s = window_s
+        self.namespace = namespace
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        shared_key = f"{self.namespace}:{key}"
+        recent = await asyncio.to_thread(shared_state.get, shared_key)
+        if recent is not None:
+            record_cache("singleflight", hit=True)
+            return recent["result"]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            record_cache("singleflight", hit=True)
+        else:
+            task = asyncio.ensure_future(self._run(shared_key, fn))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, key=key: self._in_flight.pop(key, None))
+
+        # shield: one caller disconnecting must not cancel the shared run
+        return await asyncio.shield(task)
+
+    async def _run(self, shared_key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while not await asyncio.to_thread(shared_state.claim, shared_key, COALESCE_JOB_TTL_S):
+            # another worker is running it: wait for its result
+            await asyncio.sleep(COALESCE_POLL_S)
+            recent = await asyncio.to_thread(shared_state.get, shared_key)
+            if recent is not None:
+                record_cache("singleflight", hit=True)
+                return recent["result"]
+        try:
+            # the previous owner may have finished between our poll and our claim
+            recent = await asyncio.to_thread(shared_state.get, shared_key)
+            if recent is not None:
+                record_cache("singleflight", hit=True)
+                return recent["result"]
+            record_cache("singleflight", hit=False)
+            result = await fn()
+            # {"error": ...} results (e.g. no BMC data yet) must not stick for the window
+            failed = isinstance(result, dict) and "error" in result
+            if self.window_s > 0 and not failed:
+                await asyncio.to_thread(shared_state.put, shared_key, {"result": result}, self.window_s)
+            return result
+        finally:
+            await asyncio.to_thread(shared_state.release, shared_key)
+
+
+pipeline_flights = SingleFlight()
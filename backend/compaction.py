@@ -0,0 +1,180 @@
+## Standard Libraries
+import hashlib
+import logging
+import re
+from os import environ
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Token budget for the text handed to SummaryAgent. Overridable per deployment.
+SUMMARY_TOKEN_BUDGET = int(environ.get("SUMMARY_TOKEN_BUDGET", 24000))
+# Rough chars-per-token ratio for Gemini tokenizers on English prose.
+CHARS_PER_TOKEN = float(environ.get("COMPACTION_CHARS_PER_TOKEN", 4.0))
+# Rows kept from each table (after the header) before it is collapsed.
+TABLE_KEEP_ROWS = int(environ.get("COMPACTION_TABLE_KEEP_ROWS", 5))
+
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_WORD = re.compile(r"[A-Za-z0-9$%€£]+")
+_NUMBER = re.compile(r"\d")
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the token count of `text` without calling the model API."""
+    if not text:
+        return 0
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _is_table_line(line: str) -> bool:
+    return line.strip().startswith("|") and line.count("|") >= 2
+
+
+def collapse_tables(text: str, keep_rows: int = TABLE_KEEP_ROWS) -> str:
+    """Truncate markdown tables to their header plus the first `keep_rows` rows."""
+    out: List[str] = []
+    table: List[str] = []
+
+    def flush():
+        if not table:
+            return
+        header = table[:2] if len(table) > 1 and _TABLE_SEPARATOR.match(table[1]) else table[:1]
+        body = table[len(header):]
+        out.extend(header)
+        out.extend(body[:keep_rows])
+        if len(body) > keep_rows:
+            out.append(f"| ... {len(body) - keep_rows} more rows omitted |")
+        table.clear()
+
+    for line in text.splitlines():
+        if _is_table_line(line):
+            table.append(line)
+        else:
+            flush()
+            out.append(line)
+    flush()
+    return "\n".join(out)
+
+
+def _split_paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    return text[: max(int((max_tokens - 1) * CHARS_PER_TOKEN), 1)]
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> List[str]:
+    """Split a paragraph into pieces of at most `max_tokens`.
+
+    Cuts on line boundaries first (bullet lists often have no blank lines),
+    then on sentence boundaries, and hard-truncates only what is left.
+    """
+    units: List[str] = []
+    for line in paragraph.splitlines():
+        if count_tokens(line) <= max_tokens:
+            units.append(line)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", line):
+            while count_tokens(sentence) > max_tokens:
+                head = _truncate(sentence, max_tokens)
+                units.append(head)
+                sentence = sentence[len(head):]
+            units.append(sentence)
+
+    pieces: List[str] = []
+    current = ""
+    for unit in units:
+        if not unit.strip():
+            continue
+        candidate = f"{current}\n{unit}" if current else unit
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = unit
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _fingerprint(paragraph: str) -> str:
+    normalized = " ".join(_WORD.findall(paragraph.lower()))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _score(paragraph: str, file_index: int, position: int) -> float:
+    """Rank a paragraph by information density, favouring earlier content.
+
+    Unique words and figures (prices, percentages, dates) carry most of the
+    signal for a business summary; appendix-like material late in a file and
+    later files are slightly penalised.
+    """
+    words = _WORD.findall(paragraph.lower())
+    if not words:
+        return 0.0
+    density = len(set(words)) / len(words)
+    figures = min(len(_NUMBER.findall(paragraph)), 20) / 20
+    return density + 0.5 * figures - 0.01 * position - 0.05 * file_index
+
+
+def compact_texts(texts: List[str], token_budget: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """Merge per-file extractions into one prompt that fits `token_budget`.
+
+    - Collapses long tables.
+    - Drops paragraphs already seen in an earlier file (or earlier in the same file).
+    - If still over budget, keeps the highest-ranked paragraphs in their
+      original order until the budget is spent. Paragraphs too large to rank
+      on their own are split into smaller pieces first, so non-empty input
+      never compacts to nothing.
+    """
+    input_tokens = sum(count_tokens(t) for t in texts)
+    # largest piece ranked as a unit; bigger paragraphs are split
+    piece_tokens = max(token_budget // 8, 1)
+
+    seen = set()
+    paragraphs: List[Tuple[int, int, str]] = []
+    for file_index, text in enumerate(texts):
+        pieces = []
+        for paragraph in _split_paragraphs(collapse_tables(text)):
+            if count_tokens(paragraph) > token_budget:
+                pieces.extend(_split_oversized(paragraph, piece_tokens))
+            else:
+                pieces.append(paragraph)
+        for position, paragraph in enumerate(pieces):
+            fp = _fingerprint(paragraph)
+            if fp in seen:
+                continue
+            seen.add(fp)
+            paragraphs.append((file_index, position, paragraph))
+
+    total = sum(count_tokens(p) for _, _, p in paragraphs)
+    if total > token_budget:
+        ranked = sorted(
+            range(len(paragraphs)),
+            key=lambda i: _score(paragraphs[i][2], paragraphs[i][0], paragraphs[i][1]),
+            reverse=True,
+        )
+        keep = set()
+        used = 0
+        for i in ranked:
+            cost = count_tokens(paragraphs[i][2])
+            if used + cost > token_budget:
+                continue
+            keep.add(i)
+            used += cost
+        if not keep and ranked:
+            # budget smaller than any piece: keep the best one, cut to fit
+            file_index, position, paragraph = paragraphs[ranked[0]]
+            paragraphs[ranked[0]] = (file_index, position, _truncate(paragraph, token_budget))
+            keep.add(ranked[0])
+        paragraphs = [p for i, p in enumerate(paragraphs) if i in keep]
+
+    compacted = "\n\n".join(p for _, _, p in paragraphs)
+    logger.info(
+        "compaction: files=%d input_tokens=%d compacted_tokens=%d budget=%d",
+        len(texts),
+        input_tokens,
+        count_tokens(compacted),
+        token_budget,
+    )
+    return compacted
@@ -0,0 +1,158 @@
+## Standard Libraries
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from os import environ
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from clients import get_storage_client
+from telemetry import span
+
+# Objects up to this size are downloaded straight into memory; anything larger
+# is spooled to a temp file and memory-mapped so the bytes live in the page cache.
+SPOOL_THRESHOLD_BYTES = int(environ.get("DOC_SPOOL_THRESHOLD_BYTES", 8 * 1024 * 1024))
+
+Buffer = Union[bytes, memoryview]
+
+
+def is_local_path(p: str) -> bool:
+    return os.path.exists(p)
+
+
+def split_gcs_path(gcs_path: str) -> Tuple[str, str]:
+    """Return (bucket_name, blob_name) for gs://bucket/blob or a plain blob name."""
+    if gcs_path.startswith("gs://"):
+        _, _, rest = gcs_path.partition("gs://")
+        bucket_name, _, blob_name = rest.partition("/")
+        return bucket_name, blob_name
+    return environ["GCS_BUCKET"], gcs_path
+
+
+def _get_blob(gcs_path: str):
+    storage_client = get_storage_client()
+    bucket_name, blob_name = split_gcs_path(gcs_path)
+    # get_blob fetches metadata (size) so we can pick memory vs spool up front
+    blob = storage_client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"GCS object not found: {gcs_path}")
+    return blob
+
+
+@contextmanager
+def _mmap_file(f) -> Iterator[Buffer]:
+    if os.fstat(f.fileno()).st_size == 0:
+        yield b""
+        return
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    try:
+        yield view
+    finally:
+        view.release()
+        mm.close()
+
+
+@contextmanager
+def open_document(path: str) -> Iterator[Buffer]:
+    """Yield the raw bytes of a local or GCS document without extra copies.
+
+    - Local files are memory-mapped.
+    - Small GCS objects are downloaded once into a bytes object.
+    - Large GCS objects are spooled to a temp file and memory-mapped.
+
+    The yielded buffer is only valid inside the `with` block.
+    """
+    if is_local_path(path):
+        with open(path, "rb") as f, _mmap_file(f) as view:
+            yield view
+        return
+
+    with span("gcs_download", path=path):
+        blob = _get_blob(path)
+        data = None
+        if blob.size is not None and blob.size <= SPOOL_THRESHOLD_BYTES:
+            data = blob.download_as_bytes()
+    if data is not None:
+        yield data
+        return
+
+    with tempfile.TemporaryFile() as spool:
+        with span("gcs_download", path=path, spooled=True):
+            blob.download_to_file(spool)
+            spool.flush()
+        with _mmap_file(spool) as view:
+            yield view
+
+
+@contextmanager
+def open_document_file(path: str) -> Iterator[io.IOBase]:
+    """Yield a seekable binary file object for a local or GCS document.
+
+    Used by parsers (docx, pdf) that want a file rather than a buffer, so large
+    GCS objects are streamed to a spool file instead of held in memory.
+    """
+    if is_local_path(path):
+        with open(path, "rb") as f:
+            yield f
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD_BYTES) as spool:
+        with span("gcs_download", path=path):
+            _get_blob(path).download_to_file(spool)
+        spool.seek(0)
+        yield spool
+
+
+def as_bytes(buf: Buffer) -> bytes:
+    """Return `buf` as bytes, copying only when it is a view.
+
+    SDK request types (genai Part, vision Image) require real bytes; call this
+    at that boundary and nowhere earlier.
+    """
+    return buf if isinstance(buf, bytes) else buf.tobytes()
+
+
+def decode_text(buf: Buffer) -> str:
+    """Decode a text document buffer, falling back to latin-1."""
+    try:
+        return str(buf, "utf-8")
+    except UnicodeDecodeError:
+        return str(buf, "latin-1", errors="ignore")
+
+
+def _pdf_stream(pdf: Buffer):
+    """A seekable stream over `pdf` for pypdf.
+
+    Memory-mapped views are read through their mmap in place; BytesIO would
+    copy the whole view first.
+    """
+    if isinstance(pdf, memoryview) and isinstance(pdf.obj, mmap.mmap):
+        pdf.obj.seek(0)
+        return pdf.obj
+    return io.BytesIO(pdf)
+
+
+def pdf_page_texts(pdf: Buffer) -> List[str]:
+    """Extractable text of every page ('' for scanned pages); [] if unreadable."""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(_pdf_stream(pdf))
+        return [page.extract_text() or "" for page in reader.pages]
+    except Exception:
+        return []
+
+
+def select_pdf_pages(pdf: Buffer, page_numbers: Iterable[int]) -> bytes:
+    """A new PDF holding only the given (1-based) pages, in order."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(_pdf_stream(pdf))
+    writer = PdfWriter()
+    for n in page_numbers:
+        writer.add_page(reader.pages[n - 1])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
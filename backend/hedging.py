@@ -0,0 +1,131 @@
+"""Hedged requests for idempotent LLM calls.
+
+If the primary attempt has not produced its first token within the p-th
+percentile of recently observed time-to-first-token, one identical backup
+attempt is started; whichever finishes first wins and the other is
+cancelled. Hedges are paid from a per-call-type budget (a fraction of primary
+calls), so tail latency drops without doubling average cost.
+
+Off unless LLM_HEDGING=1. Only wrap calls that are safe to run twice.
+"""
+
+## Standard Libraries
+import asyncio
+import logging
+import re
+from collections import deque
+from os import environ
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telemetry import HEDGES
+
+logger = logging.getLogger(__name__)
+
+HEDGING_ENABLED = environ.get("LLM_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = float(environ.get("HEDGE_PERCENTILE", 95))
+# extra requests allowed per primary request, e.g. 0.1 = at most ~10% more calls
+HEDGE_BUDGET_RATIO = float(environ.get("HEDGE_BUDGET_RATIO", 0.1))
+HEDGE_MIN_SAMPLES = int(environ.get("HEDGE_MIN_SAMPLES", 20))
+HEDGE_MIN_DELAY_S = float(environ.get("HEDGE_MIN_DELAY_S", 0.5))
+
+
+class HedgeSignal:
+    """Handed to each attempt: set `started` once it holds an LLM slot and
+    `first_token` when the first output arrives."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.first_token = asyncio.Event()
+
+
+class Hedger:
+    def __init__(self, call_type: str, budget_ratio: Optional[float] = None):
+        self.call_type = call_type
+        # e.g. "extract_text:strong" -> HEDGE_BUDGET_EXTRACT_TEXT_STRONG
+        env_name = "HEDGE_BUDGET_" + re.sub(r"\W", "_", call_type.upper())
+        self.budget_ratio = float(
+            environ.get(env_name, budget_ratio if budget_ratio is not None else HEDGE_BUDGET_RATIO)
+        )
+        self.samples: deque = deque(maxlen=200)
+        self.credits = 0.0
+
+    def delay(self) -> Optional[float]:
+        """Hedge delay from recent time-to-first-token, or None while warming up."""
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY_S, ordered[idx])
+
+    async def run(self, fn: Callable[[HedgeSignal], Awaitable[Any]]) -> Any:
+        if not HEDGING_ENABLED:
+            return await fn(HedgeSignal())
+
+        loop = asyncio.get_running_loop()
+        # each primary call earns a fraction of a hedge, capped so idle time can't bank a burst
+        self.credits = min(self.credits + self.budget_ratio, max(1.0, 10 * self.budget_ratio))
+
+        primary_signal = HedgeSignal()
+        primary = asyncio.ensure_future(fn(primary_signal))
+        tasks = {primary}
+        try:
+            await self._wait_first_token(primary, primary_signal, loop)
+            if not primary.done() and not primary_signal.first_token.is_set():
+                if self.credits >= 1.0:
+                    self.credits -= 1.0
+                    HEDGES.labels(call_type=self.call_type, result="launched").inc()
+                    logger.info("hedging %s after %.2fs", self.call_type, self.delay())
+                    tasks.add(asyncio.ensure_future(fn(HedgeSignal())))
+                else:
+                    HEDGES.labels(call_type=self.call_type, result="no_budget").inc()
+            return await self._first_success(primary, tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _wait_first_token(self, primary, signal: HedgeSignal, loop):
+        """Wait until the primary's first token (recording TTFT) or the hedge delay."""
+        started = asyncio.ensure_future(signal.started.wait())
+        await asyncio.wait({primary, started}, return_when=asyncio.FIRST_COMPLETED)
+        started.cancel()
+        if primary.done():
+            return
+        t0 = loop.time()
+        delay = self.delay()
+        first = asyncio.ensure_future(signal.first_token.wait())
+        # record the primary's TTFT even when it arrives after the delay, or
+        # the percentile is taken over samples cut off at its own value and
+        # keeps falling; a primary cancelled before its first token records none
+        first.add_done_callback(lambda f: f.cancelled() or self.samples.append(loop.time() - t0))
+        primary.add_done_callback(lambda _: first.cancel())
+        await asyncio.wait({primary, first}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+        if delay is None:
+            # still warming up: don't hedge, wait for the first token
+            await asyncio.wait({primary, first}, return_when=asyncio.FIRST_COMPLETED)
+
+    async def _first_success(self, primary, tasks):
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        HEDGES.labels(
+                            call_type=self.call_type,
+                            result="primary_won" if task is primary else "hedge_won",
+                        ).inc()
+                    return task.result()
+                error = error or task.exception()
+        raise error
+
+
+_hedgers: Dict[str, Hedger] = {}
+
+
+def get_hedger(call_type: str) -> Hedger:
+    hedger = _hedgers.get(call_type)
+    if hedger is None:
+        hedger = _hedgers[call_type] = Hedger(call_type)
+    return hedger
@@ -0,0 +1,228 @@
+"""Fast JSON responses, compression and conditional GETs for the read endpoints.
+
+Every table write bumps that table's version (`bump`), kept in
+`shared_state` so all workers agree on it. A read endpoint
+derives its ETag from the versions of the tables it serves *before* reading,
+so a client presenting a matching If-None-Match gets a 304 without a
+BigQuery query. The last encoded body per route is also kept, so a repeat
+load from a client without the ETag skips the query and serialization too.
+
+Versions only see writes made through this store, i.e. this instance. Writes
+from other instances (Cloud Run scales out) are caught by also folding each
+table's BigQuery metadata (last-modified time and row counts, a `get_table`
+call, not a query) into the ETag; that stamp is re-read at most every
+TABLE_META_TTL_S seconds, which bounds how long another instance's write can
+go unnoticed. A stamp change that no local `bump` accounts for is reported to
+the `on_external_write` hooks, so indexes built from local writes (the
+portfolio) can drop what they hold for that table.
+
+Bodies are rendered with orjson and compressed above COMPRESS_MIN_BYTES
+(brotli when the `brotli` package is installed and accepted, else gzip).
+"""
+
+## Standard Libraries
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+from os import environ
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+## Third-party Libraries
+from fastapi import Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+
+import shared_state
+from clients import get_bigquery_client
+from telemetry import record_bigquery_job, record_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # plain json fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(environ.get("BROTLI_QUALITY", 5))
+TABLE_META_TTL_S = float(environ.get("TABLE_META_TTL_S", 5))
+
+# (route, accepted encoding) -> (etag, content encoding, body) of the last response
+_bodies: Dict[Tuple[str, str], Tuple[str, str, bytes]] = {}
+# called with the table name when another instance wrote to it
+_external_write_hooks: List[Callable[[str], None]] = []
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamSafeGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves streaming routes alone.
+
+    gzip buffers a streamed body until enough output accumulates (in practice
+    until the stream ends), so an NDJSON client would get every line at once.
+    Routes in `stream_paths` are passed through uncompressed.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES, stream_paths: Iterable[str] = ()):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL)
+        self.stream_paths = frozenset(stream_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope.get("path") in self.stream_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def on_external_write(hook: Callable[[str], None]):
+    """Call `hook(table)` when `table`'s metadata changes without a local write."""
+    _external_write_hooks.append(hook)
+
+
+def bump(table: str) -> int:
+    """Record that `table` was written; invalidates ETags that cover it."""
+    # the metadata stamp changes with this write too; re-read it right away,
+    # and don't take that change for another instance's write
+    shared_state.put(f"table-meta-local:{table}", True)
+    shared_state.delete(f"table-meta:{table}")
+    return shared_state.bump(f"table:{table}")
+
+
+def table_versions(tables: Iterable[str]) -> Dict[str, int]:
+    versions = shared_state.versions(f"table:{t}" for t in tables)
+    return {name.split(":", 1)[1]: v for name, v in versions.items()}
+
+
+def _fetch_table_stamp(table: str) -> str:
+    from google.api_core.exceptions import NotFound
+
+    table_id = f"{environ.get('PROJECT_ID_SA')}.{environ.get('BQ_DATASET')}.{table}"
+    try:
+        record_bigquery_job("get_table")
+        meta = get_bigquery_client().get_table(table_id)
+    except NotFound:
+        return "missing"
+    modified = int(meta.modified.timestamp() * 1000) if meta.modified else 0
+    # streaming inserts show up in the buffer before they touch `modified`
+    buffered = meta.streaming_buffer.estimated_rows if meta.streaming_buffer else 0
+    return f"{modified}.{meta.num_rows or 0}.{buffered or 0}"
+
+
+def table_stamp(table: str) -> str:
+    """`table`'s BigQuery metadata stamp, cached for TABLE_META_TTL_S."""
+    key = f"table-meta:{table}"
+    stamp = shared_state.get(key)
+    if stamp is None:
+        stamp = _fetch_table_stamp(table)
+        shared_state.put(key, stamp, ttl_s=TABLE_META_TTL_S)
+        seen = shared_state.get(f"table-meta-seen:{table}")
+        local = shared_state.get(f"table-meta-local:{table}") is not None
+        shared_state.put(f"table-meta-seen:{table}", stamp)
+        shared_state.delete(f"table-meta-local:{table}")
+        if seen is not None and seen != stamp and not local:
+            logger.info("%s changed outside this instance", table)
+            for hook in _external_write_hooks:
+                hook(table)
+    return stamp
+
+
+def etag_for(tables: Iterable[str]) -> Optional[str]:
+    """ETag over `tables`, or None when their metadata can't be read."""
+    tables = list(tables)
+    try:
+        stamps = [table_stamp(t) for t in tables]
+    except Exception as e:
+        logger.warning("table metadata unavailable, serving uncached: %s", e)
+        return None
+    digest = hashlib.blake2b("|".join(stamps).encode(), digest_size=6).hexdigest()
+    # the store's epoch: versions restart at 0 when it is recreated, so old ETags must not match
+    parts = "-".join(str(v) for v in table_versions(tables).values())
+    return f'W/"{shared_state.epoch()}-{parts}-{digest}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    # weak comparison: W/"x" and "x" are the same validator
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == bare for t in tags)
+
+
+def _choose_encoding(request: Request) -> str:
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+async def cached_json(
+    request: Request, route: str, tables: Iterable[str], load: Callable[[], Any]
+) -> Response:
+    """Serve `await load()` with an ETag over `tables`.
+
+    Returns 304 when the client's If-None-Match still matches and the cached
+    encoded body when another client already fetched this version; only
+    otherwise is `load` called. Results containing "error" are not cached.
+    """
+    # blocking: SQLite and (every TABLE_META_TTL_S) a BigQuery metadata call
+    etag = await asyncio.to_thread(etag_for, tables)
+    if etag is None:
+        record_cache(route, hit=False)
+        return FastJSONResponse(await load())
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _matches(request, etag):
+        record_cache(route, hit=True)
+        return Response(status_code=304, headers=headers)
+
+    accepted = _choose_encoding(request)
+    cached = _bodies.get((route, accepted))
+    if cached is not None and cached[0] == etag:
+        record_cache(route, hit=True)
+        _, encoding, body = cached
+    else:
+        record_cache(route, hit=False)
+        content = await load()
+        if isinstance(content, dict) and "error" in content:
+            return FastJSONResponse(content)
+        body = dumps(content)
+        encoding = accepted if len(body) >= COMPRESS_MIN_BYTES else "identity"
+        body = _encode(body, encoding)
+        _bodies[(route, accepted)] = (etag, encoding, body)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,255 @@
+"""Shared admission control for Gemini calls.
+
+One `ModelLimiter` per model name keeps an AIMD concurrency limit: every
+successful call nudges the limit up by ~1 per window, every rate-limit error
+halves it (at most once per cooldown). Callers beyond the limit wait in a
+bounded FIFO queue; when that is full the call is rejected immediately with
+`AdmissionRejected`, which the API turns into HTTP 429 + Retry-After.
+
+Two entry points:
+- `call(model, fn)` gates and retries a single direct SDK call (extract_text).
+- `run_agent(fn)` retries a whole ADK run; the individual model calls inside
+  it are gated by `before_model_callback` / `after_model_callback`, which the
+  agent factories attach to every LlmAgent.
+
+A `call` inside an ADK run (extract_text in the SummaryAgent tool) that is
+still rate limited after its own retries raises `RateLimitExhausted`, which
+`run_agent` does not retry, so the two retry loops don't multiply.
+"""
+
+## Standard Libraries
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from os import environ
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telemetry import LLM_ADMISSION, LLM_CONCURRENCY_LIMIT, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CONCURRENCY = float(environ.get("LLM_INITIAL_CONCURRENCY", 4))
+MIN_CONCURRENCY = float(environ.get("LLM_MIN_CONCURRENCY", 1))
+MAX_CONCURRENCY = float(environ.get("LLM_MAX_CONCURRENCY", 32))
+MAX_QUEUE = int(environ.get("LLM_MAX_QUEUE", 64))
+MAX_ATTEMPTS = int(environ.get("LLM_MAX_ATTEMPTS", 5))
+BACKOFF_BASE_S = float(environ.get("LLM_BACKOFF_BASE_S", 1.0))
+BACKOFF_CAP_S = float(environ.get("LLM_BACKOFF_CAP_S", 30.0))
+# A burst of 429s from the same window should only halve the limit once.
+DECREASE_COOLDOWN_S = float(environ.get("LLM_DECREASE_COOLDOWN_S", 2.0))
+
+
+class AdmissionRejected(Exception):
+    """The model's wait queue is full; the client should retry later."""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"LLM queue for {model} is full; retry after {retry_after}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class RateLimitExhausted(Exception):
+    """A call was still rate limited after all of its retries."""
+
+    def __init__(self, model: str, attempts: int):
+        super().__init__(f"{model} still rate limited after {attempts} attempts")
+        self.model = model
+        self.attempts = attempts
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True for Vertex/Gemini quota errors (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    for attr in ("code", "status_code"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    text = f"{type(exc).__name__} {exc}"
+    return "RESOURCE_EXHAUSTED" in text or "TooManyRequests" in text or "ResourceExhausted" in text
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (0-based) attempt."""
+    return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2**attempt)))
+
+
+class ModelLimiter:
+    def __init__(self, model: str):
+        self.model = model
+        self.limit = INITIAL_CONCURRENCY
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.last_decrease = 0.0
+        self.avg_latency_s = 5.0
+        self._publish()
+
+    def _publish(self):
+        LLM_CONCURRENCY_LIMIT.labels(model=self.model).set(self.limit)
+        LLM_IN_FLIGHT.labels(model=self.model).set(self.in_flight)
+        LLM_QUEUE_DEPTH.labels(model=self.model).set(len(self.waiters))
+
+    def retry_after(self) -> int:
+        """Rough time for the current queue to drain at the current limit."""
+        drain = self.avg_latency_s * (len(self.waiters) + 1) / max(self.limit, 1)
+        return int(min(max(math.ceil(drain), 1), 60))
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            LLM_ADMISSION.labels(model=self.model, result="admitted").inc()
+            self._publish()
+            return
+        if len(self.waiters) >= MAX_QUEUE:
+            LLM_ADMISSION.labels(model=self.model, result="rejected").inc()
+            raise AdmissionRejected(self.model, self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        LLM_ADMISSION.labels(model=self.model, result="queued").inc()
+        self._publish()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut in self.waiters:
+                self.waiters.remove(fut)
+            elif fut.done() and not fut.cancelled():
+                # we were handed a slot just as we got cancelled
+                self.release()
+            self._publish()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            fut = self.waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+        self._publish()
+
+    def on_success(self, latency_s: Optional[float] = None):
+        if latency_s is not None:
+            self.avg_latency_s = 0.8 * self.avg_latency_s + 0.2 * latency_s
+        self.limit = min(MAX_CONCURRENCY, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self):
+        now = time.monotonic()
+        if now - self.last_decrease < DECREASE_COOLDOWN_S:
+            return
+        self.last_decrease = now
+        self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+        logger.warning("rate limited on %s; concurrency limit -> %.1f", self.model, self.limit)
+        self._publish()
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = _limiters[model] = ModelLimiter(model)
+    return limiter
+
+
+async def call(model: str, fn: Callable[[], Awaitable[Any]], attempts: int = MAX_ATTEMPTS) -> Any:
+    """Run `fn` under the model's concurrency limit, retrying on rate limits."""
+    limiter = get_limiter(model)
+    for attempt in range(attempts):
+        await limiter.acquire()
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception as e:
+            limiter.release()
+            if not is_rate_limited(e):
+                raise
+            if attempt == attempts - 1:
+                # already retried here; callers (run_agent) must not retry again
+                raise RateLimitExhausted(model, attempts) from e
+            limiter.on_overload()
+            LLM_ADMISSION.labels(model=model, result="retried").inc()
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        except BaseException:
+            # cancelled (e.g. a losing hedge): free the slot, no AIMD signal
+            limiter.release()
+            raise
+        limiter.release()
+        limiter.on_success(time.perf_counter() - start)
+        return result
+
+
+# ---------- ADK integration ----------
+# Slots held by the model calls of the ADK run currently executing in this task.
+_held: ContextVar[Optional[List[tuple]]] = ContextVar("llm_admission_held", default=None)
+# Called each time a model call of the current ADK run is granted a slot.
+_on_admitted: ContextVar[Optional[Callable[[], None]]] = ContextVar("llm_admission_on_admitted", default=None)
+
+
+async def before_model_callback(callback_context, llm_request):
+    held = _held.get()
+    if held is None:
+        # not running under run_agent (e.g. `adk web`): no gating
+        return None
+    limiter = get_limiter(llm_request.model or "default")
+    await limiter.acquire()
+    held.append((limiter, time.perf_counter()))
+    on_admitted = _on_admitted.get()
+    if on_admitted is not None:
+        on_admitted()
+    return None
+
+
+async def after_model_callback(callback_context, llm_response):
+    held = _held.get()
+    if not held or getattr(llm_response, "partial", False):
+        return None
+    limiter, start = held.pop()
+    limiter.release()
+    limiter.on_success(time.perf_counter() - start)
+    return None
+
+
+async def run_agent(
+    fn: Callable[[], Awaitable[Any]],
+    attempts: int = MAX_ATTEMPTS,
+    on_admitted: Optional[Callable[[], None]] = None,
+) -> Any:
+    """Run one ADK invocation with gated model calls, retrying on rate limits.
+
+    `fn` must start a fresh session on every call so a retry is a clean re-run.
+    `on_admitted` is called whenever one of its model calls gets a slot (time
+    spent queued before that is not the model's latency).
+    """
+    admitted_token = _on_admitted.set(on_admitted)
+    try:
+        return await _run_agent(fn, attempts)
+    finally:
+        _on_admitted.reset(admitted_token)
+
+
+async def _run_agent(fn: Callable[[], Awaitable[Any]], attempts: int) -> Any:
+    for attempt in range(attempts):
+        held: List[tuple] = []
+        token = _held.set(held)
+        try:
+            return await fn()
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == attempts - 1:
+                raise
+            for limiter, _ in held:
+                limiter.on_overload()
+            LLM_ADMISSION.labels(model="adk", result="retried").inc()
+        finally:
+            for limiter, _ in held:
+                limiter.release()
+            held.clear()
+            _held.reset(token)
+        await asyncio.sleep(backoff_delay(attempt))
@@ -1,23 +1,65 @@
 ## Standard Libraries
+import startup  # first: with STARTUP_IMPORT_TIMING=1 it times every import that follows
+import asyncio
 import json
+import logging
 from os import environ
 import re
+from contextlib import asynccontextmanager
+from collections import defaultdict
 from pydantic import BaseModel
-from typing import Any, Dict, List
-from fastapi import FastAPI, File, UploadFile, Form
+from typing import Any, Dict, List, Tuple
+from fastapi import FastAPI, File, UploadFile, Form, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-## Google Libraries
-from google.oauth2 import service_account
-from google.cloud import vision, storage, bigquery
-
-# from google import genai
+## Google SDKs are imported lazily (see clients.py / startup.warm_up)
+import http_cache
+import portfolio
+from clients import get_bigquery_client, get_storage_client, get_vision_client
+from coalescing import fingerprint, pipeline_flights
+from documents import Buffer, as_bytes
+from llm_admission import AdmissionRejected
+from telemetry import mark_process_dead, metrics_middleware, record_bigquery_job, render_metrics, span
 from agents.bmc_agent import bmc_main
 from agents.hypothesis_agent import hypotheses_main
 from agents.experiments_agent import experiments_main
 
+logging.basicConfig(level=environ.get("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+# projects of a portfolio batch run concurrently up to this many, across all batches
+PORTFOLIO_CONCURRENCY = int(environ.get("PORTFOLIO_CONCURRENCY", 4))
+PORTFOLIO_STAGES = ("bmc", "hypotheses", "experiments")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # WARMUP_ON_STARTUP=1 pays SDK imports, credentials and agent construction
+    # before the first request; otherwise they happen lazily on first use.
+    # Under serve.py this runs once in every worker.
+    if environ.get("WARMUP_ON_STARTUP", "0") == "1":
+        await asyncio.to_thread(startup.warm_up)
+    startup.mark_ready()
+    logging.getLogger("startup").info("startup report: %s", startup.startup_report(top=10))
+    yield
+    mark_process_dead()
+
+
 ## FastAPI App Initialization
-app = FastAPI(title="ADK BMC Pipeline", version="1.0.0")
+app = FastAPI(
+    title="ADK BMC Pipeline",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=http_cache.FastJSONResponse,
+)
+# responses already encoded by http_cache.cached_json pass through untouched;
+# NDJSON streams stay uncompressed so each line reaches the client as it is sent
+app.add_middleware(
+    http_cache.StreamSafeGZipMiddleware,
+    minimum_size=http_cache.COMPRESS_MIN_BYTES,
+    stream_paths=("/run_portfolio_pipeline",),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,6 +67,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(metrics_middleware)
+# another instance's writes reach the portfolio index only through a rebuild
+http_cache.on_external_write(portfolio.invalidate)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """LLM queue is full: tell the client when to come back instead of failing."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 # ---------- Request models ----------
@@ -41,6 +96,11 @@ class BMCRequest(BaseModel):
     file_names: str
 
 
+class PortfolioRequest(BaseModel):
+    projects: List[BMCRequest]
+    stages: List[str] = list(PORTFOLIO_STAGES)
+
+
 class HypothesisRequest(BaseModel):
     bmc_data: List[Dict[str, Any]]
     project_id: int
@@ -55,22 +115,6 @@ class ExperimentRequest(BaseModel):
     sector: str
 
 
-credentials = service_account.Credentials.from_service_account_info(
-    {
-        "type": "service_account",
-        "project_id": environ["PROJECT_ID_SA"],
-        "private_key_id": environ["PRIVATE_KEY_ID"],
-        "private_key": environ["PRIVATE_KEY"].replace("\\n", "\n"),
-        "client_email": environ["CLIENT_EMAIL"],
-        "client_id": environ["CLIENT_ID"],
-        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-        "token_uri": "https://oauth2.googleapis.com/token",
-        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-        "client_x509_cert_url": environ["CLIENT_X509_CERT_URL"],
-    }
-)
-
-
 # ---------- Utility: JSON sanitizer ----------
 def safe_load_json(s: str):
     """Safely parse JSON from LLM response, removing markdown wrappers."""
@@ -81,66 +125,107 @@ def safe_load_json(s: str):
 
 
 # ================= Helper Functions =================
-def update_table(data, table_name):
-    """Append one or more JSON-serializable rows to a BigQuery table.
+def _prepare_rows(data) -> List[Dict[str, str]]:
+    """Normalize a dict or list of dicts to STRING rows with BigQuery-safe keys."""
+    rows = data if isinstance(data, list) else [data]
+    prepared = []
+    for r in rows:
+        if isinstance(r, dict):
+            prepared.append(
+                {
+                    k.replace(".", "_"): json.dumps(v) if not isinstance(v, str) else v
+                    for k, v in r.items()
+                }
+            )
+        else:
+            prepared.append({"json_payload": json.dumps(r)})
+    return prepared
 
-    - `data` may be a dict (single row) or a list of dicts (multiple rows).
-    - Dataset and table are taken from `environ` with sensible defaults.
-    - The function will create the dataset/table if they don't exist.
-    """
 
-    client = bigquery.Client(
-        project=environ["PROJECT_ID_SA"],
-        credentials=credentials,
-    )
+def _ensure_table(client, table_name: str, prepared: List[Dict[str, str]]) -> str:
+    """Create the dataset/table if needed and add any STRING columns the rows
+    carry that the table doesn't have yet. Returns the full table id."""
+    from google.cloud import bigquery
 
     dataset_name = environ.get("BQ_DATASET")
     project_id = environ.get("PROJECT_ID_SA")
     dataset_id = f"{project_id}.{dataset_name}"
     table_id = f"{dataset_id}.{table_name}"
 
-    # Normalize rows to a list
-    rows = data if isinstance(data, list) else [data]
-
     # Ensure dataset exists
     try:
+        record_bigquery_job("get_dataset")
         client.get_dataset(dataset_id)
     except Exception:
         dataset = bigquery.Dataset(dataset_id)
+        record_bigquery_job("create_dataset")
         client.create_dataset(dataset, exists_ok=True)
 
     # Ensure table exists (derive simple STRING schema from first row)
     try:
-        client.get_table(table_id)
+        record_bigquery_job("get_table")
+        table = client.get_table(table_id)
     except Exception:
-        schema = []
-        if rows and isinstance(rows[0], dict):
-            for k in rows[0].keys():
-                field_name = str(k).replace(".", "_")
-                schema.append(bigquery.SchemaField(field_name, "STRING"))
-        else:
-            schema = [bigquery.SchemaField("json_payload", "STRING")]
-
+        columns = dict.fromkeys(k for row in prepared for k in row)
+        schema = [bigquery.SchemaField(k, "STRING") for k in columns]
         table = bigquery.Table(table_id, schema=schema)
+        record_bigquery_job("create_table")
         client.create_table(table)
+        return table_id
+
+    existing = {f.name for f in table.schema or []}
+    missing = sorted({k for row in prepared for k in row} - existing)
+    if missing:
+        table.schema = list(table.schema) + [bigquery.SchemaField(k, "STRING") for k in missing]
+        record_bigquery_job("update_schema")
+        client.update_table(table, ["schema"])
+    return table_id
+
+
+def _insert_row(client, table_id: str, row: Dict[str, str]):
+    """Insert one row with a DML job.
+
+    Streaming inserts (`insert_rows_json`) sit in the streaming buffer for up
+    to ~30 minutes, and BigQuery rejects UPDATE/MERGE on those rows, so a
+    later update or portfolio MERGE of the same project would fail.
+    """
+    from google.cloud import bigquery
+
+    columns = list(row)
+    params = [
+        bigquery.ScalarQueryParameter(f"p{i}", "STRING", row[c]) for i, c in enumerate(columns)
+    ]
+    insert_sql = (
+        f"INSERT INTO `{table_id}` ({', '.join(f'`{c}`' for c in columns)}) "
+        f"VALUES ({', '.join(f'@p{i}' for i in range(len(columns)))})"
+    )
+    record_bigquery_job("insert")
+    client.query(insert_sql, job_config=bigquery.QueryJobConfig(query_parameters=params)).result()
+
+
+@span("update_table")
+def update_table(data, table_name):
+    """Append one or more JSON-serializable rows to a BigQuery table.
+
+    - `data` may be a dict (single row) or a list of dicts (multiple rows).
+    - Dataset and table are taken from `environ` with sensible defaults.
+    - The function will create the dataset/table if they don't exist.
+    """
+
+    from google.cloud import bigquery
+
+    client = get_bigquery_client()
 
     # Prepare rows (stringify non-strings) and normalize field names
-    prepared = []
-    for r in rows:
-        if isinstance(r, dict):
-            prepared.append(
-                {
-                    k.replace(".", "_"): json.dumps(v) if not isinstance(v, str) else v
-                    for k, v in r.items()
-                }
-            )
-        else:
-            prepared.append({"json_payload": json.dumps(r)})
+    prepared = _prepare_rows(data)
+    table_id = _ensure_table(client, table_name, prepared)
 
     all_errors = []
+    written = []
 
     # For each row: if project-id exists, UPDATE that row; else INSERT.
     for row in prepared:
+        errors_before = len(all_errors)
         try:
             # Find a project id-like key in the row (e.g. project-id or project_id)
             proj_key = None
@@ -152,9 +237,7 @@ def update_table(data, table_name):
 
             # If no project id in payload, fall back to inserting the row
             if not proj_key:
-                insert_errors = client.insert_rows_json(table_id, [row])
-                if insert_errors:
-                    all_errors.extend(insert_errors)
+                _insert_row(client, table_id, row)
                 continue
 
             proj_val = row.get(proj_key)
@@ -167,6 +250,7 @@ def update_table(data, table_name):
                 ]
             )
 
+            record_bigquery_job("select")
             check_job = client.query(check_sql, job_config=job_config)
             check_result = list(check_job.result())
             exists = False
@@ -194,6 +278,7 @@ def update_table(data, table_name):
                 set_clause = ", ".join(set_clauses)
                 update_sql = f"UPDATE `{table_id}` SET {set_clause} WHERE `{proj_key}` = @{where_param_name}"
 
+                record_bigquery_job("update")
                 update_job = client.query(
                     update_sql,
                     job_config=bigquery.QueryJobConfig(query_parameters=query_params),
@@ -203,19 +288,79 @@ def update_table(data, table_name):
 
             else:
                 # Insert new row
-                insert_errors = client.insert_rows_json(table_id, [row])
-                if insert_errors:
-                    all_errors.extend(insert_errors)
+                _insert_row(client, table_id, row)
 
         except Exception as e:
             all_errors.append({"row": row, "error": str(e)})
 
+        if len(all_errors) == errors_before:
+            written.append(row)
+
+    http_cache.bump(table_name)
+    portfolio.record_write(table_name, written)
+
     if all_errors:
         return {"status": "error", "errors": all_errors}
 
     return {"status": "ok", "processed_rows": len(prepared)}
 
 
+@span("bulk_upsert")
+def bulk_upsert(data, table_name, key: str = "project-id"):
+    """Upsert many rows keyed by `key` with a single MERGE job.
+
+    `update_table` costs a SELECT plus an UPDATE/INSERT per row; a portfolio
+    batch instead sends all of a table's rows as one array-of-STRUCT
+    parameter. Rows without `key` are skipped; for duplicate keys the last
+    row wins.
+    """
+
+    from google.cloud import bigquery
+
+    prepared = [r for r in _prepare_rows(data) if r.get(key) is not None]
+    if not prepared:
+        return {"status": "ok", "processed_rows": 0}
+    prepared = list({r[key]: r for r in prepared}.values())
+
+    client = get_bigquery_client()
+
+    # STRUCT field names must be identifiers, so columns like `project-id` get positional aliases
+    columns = sorted({k for r in prepared for k in r})
+    alias = {c: f"c{i}" for i, c in enumerate(columns)}
+    structs = [
+        bigquery.StructQueryParameter(
+            None,
+            *[bigquery.ScalarQueryParameter(alias[c], "STRING", r.get(c)) for c in columns],
+        )
+        for r in prepared
+    ]
+    set_clause = ", ".join(f"`{c}` = S.{alias[c]}" for c in columns if c != key)
+    try:
+        table_id = _ensure_table(client, table_name, prepared)
+        merge_sql = (
+            f"MERGE `{table_id}` T USING UNNEST(@rows) S ON T.`{key}` = S.{alias[key]} "
+            + (f"WHEN MATCHED THEN UPDATE SET {set_clause} " if set_clause else "")
+            + f"WHEN NOT MATCHED THEN INSERT ({', '.join(f'`{c}`' for c in columns)}) "
+            + f"VALUES ({', '.join(f'S.{alias[c]}' for c in columns)})"
+        )
+        record_bigquery_job("merge")
+        job = client.query(
+            merge_sql,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", structs)]
+            ),
+        )
+        job.result()
+    except Exception as e:
+        return {"status": "error", "errors": [{"table": table_name, "error": str(e)}]}
+
+    http_cache.bump(table_name)
+    portfolio.record_write(table_name, prepared)
+
+    return {"status": "ok", "processed_rows": len(prepared)}
+
+
+@span("get_data_from_table")
 def get_data_from_table(table_name, project_id):
     """Retrieve rows from a BigQuery table filtered by project_id.
 
@@ -223,10 +368,9 @@ def get_data_from_table(table_name, project_id):
     - Returns a list of rows as dictionaries.
     """
 
-    client = bigquery.Client(
-        project=environ["PROJECT_ID_SA"],
-        credentials=credentials,
-    )
+    from google.cloud import bigquery
+
+    client = get_bigquery_client()
 
     dataset_name = environ.get("BQ_DATASET")
     project_id_env = environ.get("PROJECT_ID_SA")
@@ -243,6 +387,7 @@ def get_data_from_table(table_name, project_id):
             ]
         )
 
+    record_bigquery_job("select")
     query_job = client.query(query_sql, job_config=job_config)
     results = query_job.result()
 
@@ -251,6 +396,29 @@ def get_data_from_table(table_name, project_id):
 
 
 # ================= Pipeline Runner =================
+def _bmc_file_paths(request: BMCRequest) -> List[str]:
+    # request.file_names is expected as comma-separated names
+    return [
+        f"gs://hackathon-data-bucket-001/{request.project_id}/{name.strip()}"
+        for name in request.file_names.split(",")
+        if name.strip()
+    ]
+
+
+def _project_details(request: BMCRequest) -> Dict[str, Any]:
+    return {
+        "project_name": request.project_name,
+        "project_description": request.project_description,
+        "sector": request.sector,
+        "funding_stage": request.funding_stage,
+        "team_size": request.team_size,
+        "project_document": request.project_document,
+        "cost_structure": request.cost_structure,
+        "revenue_potential": request.revenue_potential,
+        "project-id": str(request.project_id),
+    }
+
+
 async def run_bmc(file_paths: List[str]) -> Dict[str, Any]:
     """
     Execute the complete sequential pipeline.
@@ -264,17 +432,119 @@ async def run_bmc(file_paths: List[str]) -> Dict[str, Any]:
     return result
 
 
+_portfolio_slots = asyncio.Semaphore(PORTFOLIO_CONCURRENCY)
+_portfolio_runs = set()
+
+
+async def _run_portfolio_project(
+    request: BMCRequest, stages: List[str]
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Run the requested stages for one project.
+
+    Returns the streamed result and the rows to write, per table. Nothing is
+    written here: the batch upserts each table once at the end.
+    """
+    project_id = str(request.project_id)
+    result: Dict[str, Any] = {"project_id": request.project_id}
+    rows: Dict[str, Dict[str, Any]] = {}
+    try:
+        async with _portfolio_slots:
+            bmc_json = None
+            if "bmc" in stages:
+                bmc_json = await run_bmc(file_paths=_bmc_file_paths(request))
+                result["bmc"] = bmc_json
+                rows["Projects"] = _project_details(request)
+                rows["BMC"] = {**bmc_json, "project-id": project_id}
+
+            hypotheses_json = None
+            if "hypotheses" in stages:
+                if bmc_json is None:
+                    found = await asyncio.to_thread(get_data_from_table, "BMC", request.project_id)
+                    if not found:
+                        raise ValueError(f"No BMC data found for project_id {project_id}")
+                    bmc_json = found[0]
+                hypotheses_json = await hypotheses_main(bmc_json)
+                result["hypotheses"] = hypotheses_json
+                rows["Hypotheses"] = {**hypotheses_json, "project-id": project_id}
+
+            if "experiments" in stages:
+                if hypotheses_json is None:
+                    found = await asyncio.to_thread(get_data_from_table, "Hypotheses", request.project_id)
+                    if not found:
+                        raise ValueError(f"No Hypotheses data found for project_id {project_id}")
+                    hypotheses_json = found[0]
+                experiments_json = await experiments_main(hypotheses_json)
+                result["experiments"] = experiments_json
+                rows["Experiments"] = {**experiments_json, "project-id": project_id}
+    except AdmissionRejected as e:
+        return {**result, "error": str(e), "retry_after": e.retry_after}, rows
+    except Exception as e:
+        return {**result, "error": f"Pipeline failed: {str(e)}"}, rows
+    return result, rows
+
+
+def _persist_rows(rows: List[Dict[str, Any]], table: str) -> Dict[str, Any]:
+    """Write a portfolio batch's rows for `table`: one MERGE, or row by row
+    with `update_table` when the MERGE fails (e.g. rows still in the
+    streaming buffer). Lists the projects that were not persisted."""
+    result = bulk_upsert(rows, table)
+    if result["status"] == "ok":
+        return result
+    logger.warning("bulk upsert of %s failed, writing row by row: %s", table, result["errors"])
+    try:
+        result = update_table(rows, table)
+    except Exception as e:
+        result = {"status": "error", "errors": [{"table": table, "error": str(e)}]}
+        failed = {str(r.get("project-id")) for r in rows}
+    else:
+        failed = {
+            str(e["row"].get("project-id"))
+            for e in result.get("errors", [])
+            if isinstance(e.get("row"), dict)
+        }
+    if failed:
+        result["not_persisted"] = sorted(failed)
+    return result
+
+
+async def run_portfolio(
+    projects: List[BMCRequest], stages: List[str], out: asyncio.Queue
+):
+    """Run every project, putting each result on `out` as it finishes, then
+    upsert each table once. `None` on `out` marks the end."""
+    try:
+        tasks = [asyncio.ensure_future(_run_portfolio_project(p, stages)) for p in projects]
+        table_rows = defaultdict(list)
+        for next_done in asyncio.as_completed(tasks):
+            result, rows = await next_done
+            for table, row in rows.items():
+                table_rows[table].append(row)
+            await out.put(result)
+
+        writes = {}
+        for table in ("Projects", "BMC", "Hypotheses", "Experiments"):
+            if table_rows[table]:
+                writes[table] = await asyncio.to_thread(_persist_rows, table_rows[table], table)
+        await out.put({"writes": writes})
+    except Exception as e:
+        await out.put({"error": f"Portfolio run failed: {str(e)}"})
+    finally:
+        await out.put(None)
+
+
 # ================= Vision API Integration =================
-def vision_extract_text(file_bytes: bytes, mime_type: str) -> str:
+@span("vision_extract_text")
+def vision_extract_text(file_bytes: Buffer, mime_type: str) -> str:
     """Extract text from images or PDFs using Google Vision API."""
     try:
-        client = vision.ImageAnnotatorClient(credentials=credentials)
+        from google.cloud import vision
+
+        client = get_vision_client()
+        image = vision.Image(content=as_bytes(file_bytes))
 
         if mime_type == "application/pdf":
-            image = vision.Image(content=file_bytes)
             response = client.document_text_detection(image=image)
         else:
-            image = vision.Image(content=file_bytes)
             response = client.text_detection(image=image)
 
         if response.error.message:
@@ -305,11 +575,33 @@ async def root():
             "/generate_hypotheses",
             "/generate_experiments",
             "/run_full_pipeline",
+            "/run_portfolio_pipeline",
+            "/portfolio_summary",
             "/extract_text",
         ],
     }
 
 
+@app.get("/startup_report")
+async def startup_report_endpoint():
+    """Import time per package and warm-up phases for this process."""
+    return startup.startup_report()
+
+
+@app.post("/warmup")
+async def warmup_endpoint():
+    """Explicit warm-up hook (e.g. for a Cloud Run startup probe)."""
+    await asyncio.to_thread(startup.warm_up)
+    return startup.startup_report(top=10)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.post("/file_upload")
 async def upload_file_to_bucket(
     project_id: str = Form(...), files: List[UploadFile] = File(...)
@@ -324,21 +616,19 @@ async def upload_file_to_bucket(
     """
     try:
 
-        storage_client = storage.Client(
-            project=environ["PROJECT_ID_SA"],
-            credentials=credentials,
-        )
+        storage_client = get_storage_client()
         bucket_name = environ.get("GCS_BUCKET", "hackathon-data-bucket-001")
-        print(f"Uploaded bucket_name: {environ['PROJECT_ID_SA'],bucket_name}")
         bucket = storage_client.bucket(bucket_name)
 
         uploaded = []
         for upload in files:
-            contents = await upload.read()
             blob_name = f"{project_id}/{upload.filename}"
             blob = bucket.blob(blob_name)
-            # Use upload_from_string so we can handle UploadFile bytes
-            blob.upload_from_string(contents, content_type=upload.content_type)
+            # Stream the spooled upload straight to GCS instead of reading it into memory
+            with span("gcs_upload", blob=blob_name):
+                blob.upload_from_file(
+                    upload.file, content_type=upload.content_type, rewind=True
+                )
             uploaded.append(f"gs://{bucket_name}/{blob_name}")
 
         return {"uploaded": uploaded}
@@ -357,63 +647,58 @@ async def run_bmc_pipeline_endpoint(request: BMCRequest):
     """
     # Use the Pydantic model fields directly
     project_id = request.project_id
-    # request.file_names is expected as comma-separated names
-    file_names_str = request.file_names
-    file_paths = [
-        f"gs://hackathon-data-bucket-001/{project_id}/{name.strip()}"
-        for name in file_names_str.split(",")
-        if name.strip()
-    ]
+    file_paths = _bmc_file_paths(request)
 
-    result = await run_bmc(file_paths=file_paths)
+    async def run():
+        result = await run_bmc(file_paths=file_paths)
 
-    ## Update table
-    data = result.copy()
-    data["project-id"] = str(project_id)
-    project_details = {
-        "project_name": request.project_name,
-        "project_description": request.project_description,
-        "sector": request.sector,
-        "funding_stage": request.funding_stage,
-        "team_size": request.team_size,
-        "project_document": request.project_document,
-        "cost_structure": request.cost_structure,
-        "revenue_potential": request.revenue_potential,
-        "project-id": str(project_id),
-    }
-    update_table(project_details, table_name="Projects")
-    update_table(data, table_name="BMC")
-    return result
+        ## Update table
+        data = result.copy()
+        data["project-id"] = str(project_id)
+        project_details = _project_details(request)
+        await asyncio.to_thread(update_table, project_details, "Projects")
+        await asyncio.to_thread(update_table, data, "BMC")
+        return result
+
+    # identical concurrent requests (e.g. a double-clicked "Generate") share one run
+    key = f"bmc:{project_id}:{fingerprint(request.model_dump())}"
+    return await pipeline_flights.do(key, run)
 
 
 @app.post("/run_hypotheses_agent")
 async def generate_hypotheses_endpoint(request: HypothesisRequest):
     """Generate Hypotheses from BMC"""
     project_id = request.project_id
-    if request.bmc_data is None or len(request.bmc_data) == 0:
-        bmc_data = get_data_from_table("BMC", project_id)
-        if bmc_data and len(bmc_data) > 0:
-            bmc_json = bmc_data[0]
+
+    async def run():
+        if request.bmc_data is None or len(request.bmc_data) == 0:
+            bmc_data = await asyncio.to_thread(get_data_from_table, "BMC", project_id)
+            if bmc_data and len(bmc_data) > 0:
+                bmc_json = bmc_data[0]
+            else:
+                return {"error": f"No BMC data found for project_id {project_id}"}
         else:
-            return {"error": f"No BMC data found for project_id {project_id}"}
-    else:
-        bmc_json = request.bmc_data
-    result = await hypotheses_main(bmc_json)
-    ## Update table
-    data = result.copy()
-    data["project-id"] = str(project_id)
-    update_table(data, table_name="Hypotheses")
-    return result
+            bmc_json = request.bmc_data
+        result = await hypotheses_main(bmc_json)
+        ## Update table
+        data = result.copy()
+        data["project-id"] = str(project_id)
+        await asyncio.to_thread(update_table, data, "Hypotheses")
+        return result
+
+    key = f"hypotheses:{project_id}:{fingerprint(request.model_dump())}"
+    return await pipeline_flights.do(key, run)
 
 
 @app.post("/run_experiments_agent")
 async def generate_experiments_endpoint(request: ExperimentRequest):
     """Generate experiments from hypotheses."""
-    try:
-        project_id = request.project_id
+    project_id = request.project_id
+
+    async def run():
         hypotheses_json = request.hypotheses
         if not hypotheses_json or len(hypotheses_json) == 0:
-            hypotheses_data = get_data_from_table("Hypotheses", project_id)
+            hypotheses_data = await asyncio.to_thread(get_data_from_table, "Hypotheses", project_id)
             if hypotheses_data and len(hypotheses_data) > 0:
                 hypotheses_json = hypotheses_data[0]
             else:
@@ -425,49 +710,116 @@ async def generate_experiments_endpoint(request: ExperimentRequest):
         ## Update table
         data = result.copy()
         data["project-id"] = str(project_id)
-        update_table(data, table_name="Experiments")
+        await asyncio.to_thread(update_table, data, "Experiments")
         return result
 
+    try:
+        key = f"experiments:{project_id}:{fingerprint(request.model_dump())}"
+        return await pipeline_flights.do(key, run)
+
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return {"error": f"Failed to generate experiments: {str(e)}"}
 
 
+@app.post("/run_portfolio_pipeline")
+async def run_portfolio_pipeline_endpoint(request: PortfolioRequest):
+    """Run the pipelines for many projects concurrently.
+
+    Streams one NDJSON line per project as it finishes, then a final line with
+    the per-table write status, listing any projects that were not persisted.
+    Results are written with one bulk upsert per table after all projects are
+    done.
+    """
+    unknown = [s for s in request.stages if s not in PORTFOLIO_STAGES]
+    if unknown:
+        return {"error": f"Unknown stages: {unknown}; expected any of {list(PORTFOLIO_STAGES)}"}
+
+    out: asyncio.Queue = asyncio.Queue()
+    # runs to completion even if the client disconnects, so finished LLM work is still written
+    task = asyncio.ensure_future(run_portfolio(request.projects, request.stages, out))
+    _portfolio_runs.add(task)
+    task.add_done_callback(_portfolio_runs.discard)
+
+    async def stream():
+        while True:
+            item = await out.get()
+            if item is None:
+                break
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post("/get_data")
 async def get_data_endpoint(table_name: str, project_id: int):
     """Retrieve data from specified table for given project_id."""
     try:
-        data = get_data_from_table(table_name, project_id)
+        data = await asyncio.to_thread(get_data_from_table, table_name, project_id)
         return {"data": data}
     except Exception as e:
         return {"error": f"Failed to retrieve data: {str(e)}"}
 
 @app.get("/get_all_data")
-async def get_all_data_endpoint():
-    """Retrieve all data (BMC, Hypotheses, Experiments) for given project_id."""
-    try:
-        bmc_data = get_data_from_table("BMC", None)
-        hypotheses_data = get_data_from_table("Hypotheses", None)
-        experiments_data = get_data_from_table("Experiments", None)
+async def get_all_data_endpoint(request: Request):
+    """Retrieve all data (BMC, Hypotheses, Experiments) for given project_id.
 
-        return {
-            "bmc_data": bmc_data,
-            "hypotheses_data": hypotheses_data,
-            "experiments_data": experiments_data,
-        }
-    except Exception as e:
-        return {"error": f"Failed to retrieve data: {str(e)}"}
+    Served with an ETag over the three tables' write versions; a matching
+    If-None-Match returns 304 without querying BigQuery.
+    """
+
+    async def load():
+        try:
+            bmc_data = await asyncio.to_thread(get_data_from_table, "BMC", None)
+            hypotheses_data = await asyncio.to_thread(get_data_from_table, "Hypotheses", None)
+            experiments_data = await asyncio.to_thread(get_data_from_table, "Experiments", None)
+
+            return {
+                "bmc_data": bmc_data,
+                "hypotheses_data": hypotheses_data,
+                "experiments_data": experiments_data,
+            }
+        except Exception as e:
+            return {"error": f"Failed to retrieve data: {str(e)}"}
+
+    return await http_cache.cached_json(
+        request, "get_all_data", ("BMC", "Hypotheses", "Experiments"), load
+    )
 
 
 @app.get("/get_all_project_data")
-async def get_all_project_data_endpoint():
+async def get_all_project_data_endpoint(request: Request):
     """Retrieve all data (BMC, Hypotheses, Experiments) for given project_id."""
-    try:
-        ## Getting all project data
-        projects_data = get_data_from_table("Projects", None)
-        return {"projects_data": projects_data}
 
-    except Exception as e:
-        return {"error": f"Failed to retrieve data: {str(e)}"}
+    async def load():
+        try:
+            ## Getting all project data
+            projects_data = await asyncio.to_thread(get_data_from_table, "Projects", None)
+            return {"projects_data": projects_data}
+
+        except Exception as e:
+            return {"error": f"Failed to retrieve data: {str(e)}"}
+
+    return await http_cache.cached_json(request, "get_all_project_data", ("Projects",), load)
+
+@app.get("/portfolio_summary")
+async def portfolio_summary_endpoint(request: Request):
+    """Per-project counts, risk weights, experiment priorities and ai_doable
+    ratios plus portfolio totals, kept up to date by every table write."""
+
+    async def load():
+        try:
+            if not await asyncio.to_thread(portfolio.is_loaded):
+                await asyncio.to_thread(
+                    portfolio.ensure_loaded, lambda table: get_data_from_table(table, None)
+                )
+            return await asyncio.to_thread(portfolio.summary)
+        except Exception as e:
+            return {"error": f"Failed to build portfolio summary: {str(e)}"}
+
+    return await http_cache.cached_json(request, "portfolio_summary", portfolio.TABLES, load)
+
 
 @app.post("/extract_text")
 async def extract_text_endpoint(file: UploadFile = File(...)):
@@ -0,0 +1,269 @@
+"""Near-duplicate detection to reuse prior document extractions page by page.
+
+Each page (PDF page, or ~TEXT_PAGE_CHARS chunk of a text document) gets a
+MinHash signature over word shingles. `extract_text` is asked to tag its
+points with the page they came from, so every document is stored with one
+extraction per page. A new upload whose pages mostly match one known document
+of the same project folder (by estimated Jaccard similarity, in both
+directions) takes the extractions of its matched pages from that document;
+only its unmatched pages are sent to `extract_text`, and pages of the old
+document that are gone are dropped. Near-duplicate matching is scoped to the
+folder, so one project never picks up another project's content; the LSH
+index in `shared_state` is keyed by folder. Byte-identical uploads, e.g. the
+same deck under another project folder, are reused outright.
+
+Pages without extractable text (scanned PDFs) never match and are always
+extracted. Extractions that come back without page tags are stored whole and
+only reused for byte-identical uploads.
+
+The index lives only as long as the shared store (the process, or one
+`serve.py` run), often in memory, so it keeps at most NEARDUP_MAX_DOCS
+documents and evicts the oldest first.
+"""
+
+## Standard Libraries
+import hashlib
+import os
+import re
+from os import environ
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import shared_state
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+TEXT_PAGE_CHARS = int(environ.get("NEARDUP_TEXT_PAGE_CHARS", 3000))
+# estimated Jaccard similarity for two pages to count as the same page
+PAGE_MATCH_THRESHOLD = float(environ.get("NEARDUP_PAGE_THRESHOLD", 0.8))
+# share of pages (of the new and of the known document) that must match for reuse
+REUSE_MIN_FRACTION = float(environ.get("NEARDUP_REUSE_MIN_FRACTION", 0.7))
+INDEX_TTL_S = float(environ.get("NEARDUP_TTL_S", 24 * 3600))
+MAX_DOCS = int(environ.get("NEARDUP_MAX_DOCS", 500))
+
+# instruction appended to the extraction prompt, and the tag it asks for
+PAGE_TAG_INSTRUCTION = (
+    "Group the points by page: start each page's points with a line "
+    "containing only [Page N], where N is the page number in this document."
+)
+_PAGE_TAG = re.compile(r"^[ \t*#]*\[Page (\d+)\][ \t*]*$", re.MULTILINE)
+
+_MERSENNE = (1 << 61) - 1
+_PERMS = [
+    (
+        int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE | 1,
+        int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE,
+    )
+    for i in range(NUM_PERM)
+]
+_DOC_PREFIX = "neardup-doc:"
+_LSH_PREFIX = "neardup-lsh:"
+
+Signature = Optional[List[int]]
+
+
+class Plan(NamedTuple):
+    doc_id: str
+    # project folder the document was uploaded to
+    scope: str
+    signatures: List[Signature]
+    # 1-based pages still to extract (all pages when nothing is reused)
+    changed_pages: Tuple[int, ...] = ()
+    # page -> extraction taken from the matched page of `source_doc`
+    reused: Dict[int, str] = {}
+    source_doc: Optional[str] = None
+    # stored record of a byte-identical document
+    known: Optional[dict] = None
+
+    @property
+    def reusing(self) -> bool:
+        return self.known is not None or bool(self.reused)
+
+
+def content_id(data) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def scope_of(path: str) -> str:
+    """The folder of a local or GCS path, i.e. the project it belongs to."""
+    return os.path.dirname(path.rstrip("/"))
+
+
+def text_pages(text: str) -> List[str]:
+    """Split a text document into ~TEXT_PAGE_CHARS pages on paragraph breaks."""
+    pages, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        if current and len(current) + len(para) > TEXT_PAGE_CHARS:
+            pages.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current or not pages:
+        pages.append(current)
+    return pages
+
+
+def tag_pages(pages: Sequence[str]) -> str:
+    """Join text pages with the same [Page N] tags the extraction is asked for."""
+    return "\n\n".join(f"[Page {n}]\n{page}" for n, page in enumerate(pages, start=1))
+
+
+def signature(text: str) -> Signature:
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    k = min(SHINGLE_WORDS, len(words))
+    shingles = {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i : i + k]).encode(), digest_size=8).digest(), "big")
+        for i in range(len(words) - k + 1)
+    }
+    return [min((a * x + b) % _MERSENNE for x in shingles) for a, b in _PERMS]
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _band_keys(scope: str, sig: List[int]) -> List[str]:
+    folder = hashlib.blake2b(scope.encode(), digest_size=8).hexdigest()
+    keys = []
+    for band in range(BANDS):
+        rows = ",".join(str(v) for v in sig[band * ROWS : (band + 1) * ROWS])
+        keys.append(f"{_LSH_PREFIX}{folder}:{band}:{hashlib.blake2b(rows.encode(), digest_size=8).hexdigest()}:")
+    return keys
+
+
+def plan(doc_id: str, scope: str, load_pages: Callable[[], List[str]]) -> Plan:
+    """Decide what to extract for a document uploaded to folder `scope`.
+
+    `load_pages()` returns the page texts; it is not called for a document
+    already indexed under `doc_id` (a byte-identical re-upload).
+    """
+    known = shared_state.get(f"{_DOC_PREFIX}{doc_id}")
+    if known is not None:
+        return Plan(doc_id, scope, known["signatures"], source_doc=doc_id, known=known)
+    signatures = [signature(text) for text in load_pages()]
+    all_pages = tuple(range(1, len(signatures) + 1))
+
+    # candidate doc -> {new page: (similarity, old page)} of its best matching pages
+    matches: Dict[str, Dict[int, Tuple[float, int]]] = {}
+    docs: Dict[str, Optional[dict]] = {}
+    for page, sig in enumerate(signatures, start=1):
+        if sig is None:
+            continue
+        candidates = set()
+        for key in _band_keys(scope, sig):
+            for entry, _ in shared_state.scan(key):
+                cand_doc, cand_page = entry[len(key):].rsplit(":", 1)
+                candidates.add((cand_doc, int(cand_page)))
+        for cand_doc, cand_page in candidates:
+            if cand_doc not in docs:
+                docs[cand_doc] = shared_state.get(f"{_DOC_PREFIX}{cand_doc}")
+            record = docs[cand_doc]
+            # only documents stored page by page can lend single pages
+            if record is None or record.get("pages") is None or record["signatures"][cand_page - 1] is None:
+                continue
+            score = similarity(sig, record["signatures"][cand_page - 1])
+            doc_matches = matches.setdefault(cand_doc, {})
+            if score >= PAGE_MATCH_THRESHOLD and score > doc_matches.get(page, (0.0,))[0]:
+                doc_matches[page] = (score, cand_page)
+
+    if not any(matches.values()):
+        return Plan(doc_id, scope, signatures, all_pages)
+    # the known document covering most pages (earlier versions often match too)
+    source = max(matches, key=lambda d: (len(matches[d]), sum(s for s, _ in matches[d].values())))
+    matched = {page: old for page, (_, old) in matches[source].items()}
+    record = docs[source]
+    new_cover = len(matched) / len(signatures)
+    old_cover = len(set(matched.values())) / max(len(record["signatures"]), 1)
+    if new_cover < REUSE_MIN_FRACTION or old_cover < REUSE_MIN_FRACTION:
+        return Plan(doc_id, scope, signatures, all_pages)
+    changed = tuple(p for p in all_pages if p not in matched)
+    reused = {page: record["pages"][old - 1] for page, old in matched.items()}
+    return Plan(doc_id, scope, signatures, changed, reused, source)
+
+
+def split_pages(extracted: str, page_numbers: Sequence[int]) -> Optional[Dict[int, str]]:
+    """Map a page-tagged extraction back to document pages.
+
+    `page_numbers[i]` is the document page that was shown as page i+1. Returns
+    None when the output carries no page tags.
+    """
+    parts = _PAGE_TAG.split(extracted)
+    if len(parts) < 3 or not page_numbers:
+        return None
+    pages = {n: "" for n in page_numbers}
+    # points before the first tag belong to the first page
+    pages[page_numbers[0]] = parts[0].strip()
+    for shown, text in zip(parts[1::2], parts[2::2]):
+        index = int(shown) - 1
+        if 0 <= index < len(page_numbers) and text.strip():
+            n = page_numbers[index]
+            pages[n] = f"{pages[n]}\n{text.strip()}".strip()
+    return pages
+
+
+def combine(p: Plan, extracted: str) -> Tuple[str, Optional[List[str]]]:
+    """The document's extraction and its per-page extractions.
+
+    Matched pages take their reused extraction, changed pages the new one;
+    pages are None when the new extraction could not be split by page.
+    """
+    if p.known is not None:
+        return _text(p.known), p.known.get("pages")
+    fresh = split_pages(extracted, p.changed_pages) if extracted.strip() else {}
+    if fresh is None:
+        if not p.reused:
+            return extracted, None
+        # untagged output for the changed pages: keep it where they start
+        first_changed = p.changed_pages[0] if p.changed_pages else len(p.signatures) + 1
+        before = [p.reused[n] for n in sorted(p.reused) if n < first_changed]
+        after = [p.reused[n] for n in sorted(p.reused) if n > first_changed]
+        return "\n\n".join(t for t in [*before, extracted, *after] if t.strip()), None
+    pages = [p.reused.get(n, fresh.get(n, "")) for n in range(1, len(p.signatures) + 1)]
+    return "\n\n".join(t for t in pages if t.strip()), pages
+
+
+def _text(record: dict) -> str:
+    if record.get("pages") is None:
+        return record["text"]
+    # the document's text is its pages joined, as `combine` builds it
+    return "\n\n".join(t for t in record["pages"] if t.strip())
+
+
+def remember(p: Plan, text: str, pages: Optional[List[str]]):
+    """Store a document's extraction and index its pages under its folder.
+
+    Only documents stored page by page are indexed for near-duplicate reuse.
+    Beyond MAX_DOCS the oldest documents are dropped with their index entries.
+    """
+    scopes = sorted({*(p.known or {}).get("scopes", []), p.scope})
+    shared_state.put(
+        f"{_DOC_PREFIX}{p.doc_id}",
+        {
+            "signatures": p.signatures,
+            "scopes": scopes,
+            # page by page documents rebuild their text from the pages
+            "text": text if pages is None else None,
+            "pages": pages,
+        },
+        ttl_s=INDEX_TTL_S,
+    )
+    if pages is not None:
+        for key in _page_keys(p.doc_id, [p.scope], p.signatures):
+            shared_state.put(key, 1, ttl_s=INDEX_TTL_S)
+    for key, record in shared_state.trim(_DOC_PREFIX, MAX_DOCS):
+        if record.get("pages") is not None:
+            for page_key in _page_keys(key[len(_DOC_PREFIX):], record["scopes"], record["signatures"]):
+                shared_state.delete(page_key)
+
+
+def _page_keys(doc_id: str, scopes: Sequence[str], signatures: List[Signature]) -> List[str]:
+    """The LSH entries of a document's pages in each of `scopes`."""
+    return [
+        f"{key}{doc_id}:{page}"
+        for scope in scopes
+        for page, sig in enumerate(signatures, start=1)
+        if sig is not None
+        for key in _band_keys(scope, sig)
+    ]
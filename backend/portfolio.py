@@ -0,0 +1,168 @@
+"""Portfolio aggregates, maintained incrementally on every write.
+
+The dashboards need per-project counts, risk-weight totals, experiment
+priorities and ai_doable ratios, not the nested JSON payloads. `record_write`
+is called by `update_table` / `bulk_upsert` with the rows they just wrote and
+replaces that project's small summary for the table; `summary()` then costs
+O(projects). Records live in `shared_state`, so every worker serves the same
+index. When the store is new the index is rebuilt once from BigQuery on first
+use (`ensure_loaded`). Writes made by another instance are not seen here;
+when `http_cache` notices one, `invalidate` drops that table's records and
+the next `ensure_loaded` reads them again.
+"""
+
+## Standard Libraries
+import json
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("Projects", "BMC", "Hypotheses", "Experiments")
+PROJECT_FIELDS = ("project_name", "sector", "funding_stage", "team_size")
+
+# shared_state keys: portfolio:<project>\x1f<table> -> summary record
+_PREFIX = "portfolio:"
+_LOADED_KEY = "portfolio-loaded"
+
+
+def _items(value: Any, key: str) -> List[Dict[str, Any]]:
+    """The list stored under `key`, whether still a list or a JSON string."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    if isinstance(value, dict):
+        value = value.get(key, [])
+    return [v for v in value if isinstance(v, dict)] if isinstance(value, list) else []
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _is_yes(value: Any) -> bool:
+    return str(value).strip().lower() in ("yes", "true", "1")
+
+
+def _summarize(table: str, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if table == "Projects":
+        return {k: row.get(k) for k in PROJECT_FIELDS}
+    if table == "BMC":
+        return {"has_bmc": True}
+    if table == "Hypotheses":
+        items = _items(row.get("hypotheses"), "hypotheses")
+        return {
+            "hypotheses": len(items),
+            "risk_weight_total": sum(_number(h.get("risk_weight")) for h in items),
+            "hypotheses_ai_doable": sum(_is_yes(h.get("ai_doable")) for h in items),
+            "hypotheses_by_type": dict(Counter(str(h.get("type", "unknown")) for h in items)),
+        }
+    if table == "Experiments":
+        items = _items(row.get("experiments"), "experiments")
+        return {
+            "experiments": len(items),
+            "experiments_ai_doable": sum(_is_yes(e.get("ai_doable")) for e in items),
+            "experiments_by_priority": dict(Counter(str(e.get("priority", "unknown")) for e in items)),
+        }
+    return None
+
+
+def _project_key(row: Dict[str, Any]) -> Optional[str]:
+    value = row.get("project-id", row.get("project_id"))
+    return None if value is None else str(value)
+
+
+def _key(project: str, table: str) -> str:
+    return f"{_PREFIX}{project}\x1f{table}"
+
+
+def record_write(table: str, rows: List[Dict[str, Any]]):
+    """Fold rows just written to `table` into the index (last write wins)."""
+    if table not in TABLES:
+        return
+    for row in rows:
+        project = _project_key(row)
+        record = _summarize(table, row) if project else None
+        if record is not None:
+            shared_state.put(_key(project, table), record)
+
+
+def invalidate(table: str):
+    """Forget `table`'s records after a write this index did not see."""
+    if table not in TABLES:
+        return
+    for key, _ in shared_state.scan(_PREFIX):
+        if key.endswith(f"\x1f{table}"):
+            shared_state.delete(key)
+    shared_state.delete(_LOADED_KEY)
+
+
+def is_loaded() -> bool:
+    return shared_state.get(_LOADED_KEY) is not None
+
+
+def ensure_loaded(load_table: Callable[[str], List[Dict[str, Any]]]):
+    """Build the index from the stored tables once per shared store.
+
+    `load_table(name)` returns all rows of a table. Entries written while the
+    rebuild was reading are newer than what it read, so they are kept. A
+    missing table has nothing to summarize; any other error is raised and the
+    index stays unloaded so the next call retries the rebuild.
+    """
+    from google.api_core.exceptions import NotFound
+
+    if is_loaded():
+        return
+    projects = set()
+    for table in TABLES:
+        try:
+            rows = load_table(table)
+        except NotFound:
+            # table not created yet: nothing to summarize
+            logger.info("portfolio rebuild skipped %s: table not found", table)
+            continue
+        for row in rows:
+            project = _project_key(row)
+            record = _summarize(table, row) if project else None
+            if record is not None:
+                shared_state.put_if_absent(_key(project, table), record)
+                projects.add(project)
+    shared_state.put(_LOADED_KEY, True)
+    logger.info("portfolio index rebuilt: %d projects", len(projects))
+
+
+def summary() -> Dict[str, Any]:
+    """Per-project summaries plus portfolio totals."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for key, record in shared_state.scan(_PREFIX):
+        project = key[len(_PREFIX):].split("\x1f", 1)[0]
+        merged.setdefault(project, {"project_id": project, "has_bmc": False}).update(record)
+    projects = list(merged.values())
+
+    priorities: Counter = Counter()
+    for p in projects:
+        priorities.update(p.get("experiments_by_priority", {}))
+    hypotheses = sum(p.get("hypotheses", 0) for p in projects)
+    experiments = sum(p.get("experiments", 0) for p in projects)
+    hyp_doable = sum(p.get("hypotheses_ai_doable", 0) for p in projects)
+    exp_doable = sum(p.get("experiments_ai_doable", 0) for p in projects)
+    totals = {
+        "projects": len(projects),
+        "projects_with_bmc": sum(1 for p in projects if p["has_bmc"]),
+        "hypotheses": hypotheses,
+        "risk_weight_total": sum(p.get("risk_weight_total", 0) for p in projects),
+        "hypotheses_ai_doable_ratio": round(hyp_doable / hypotheses, 4) if hypotheses else None,
+        "experiments": experiments,
+        "experiments_by_priority": dict(priorities),
+        "experiments_ai_doable_ratio": round(exp_doable / experiments, 4) if experiments else None,
+    }
+    projects.sort(key=lambda p: p["project_id"])
+    return {"totals": totals, "projects": projects}
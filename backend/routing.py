@@ -0,0 +1,104 @@
+"""Model / thinking-budget routing for `extract_text`.
+
+Small text documents go to a flash model with little or no thinking; only
+large or scanned PDFs pay for the pro model with dynamic thinking. If a
+route's output fails validation the call escalates to the next, stronger
+route. All thresholds and models are environment-configurable.
+"""
+
+## Standard Libraries
+import io
+from os import environ
+from typing import List, NamedTuple, Optional
+
+FAST_MODEL = environ.get("ROUTE_FAST_MODEL", "gemini-2.5-flash")
+STRONG_MODEL = environ.get("ROUTE_STRONG_MODEL", "gemini-3-pro-preview")
+SMALL_TEXT_CHARS = int(environ.get("ROUTE_SMALL_TEXT_CHARS", 20000))
+SMALL_PDF_PAGES = int(environ.get("ROUTE_SMALL_PDF_PAGES", 10))
+# below this many extractable characters per page a PDF is treated as scanned
+SCANNED_CHARS_PER_PAGE = int(environ.get("ROUTE_SCANNED_CHARS_PER_PAGE", 100))
+MIN_OUTPUT_CHARS = int(environ.get("ROUTE_MIN_OUTPUT_CHARS", 40))
+PDF_SAMPLE_PAGES = 3
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    thinking_budget: int
+    max_output_tokens: int
+
+
+ROUTES = {
+    "text_small": Route("text_small", FAST_MODEL, 0, 4096),
+    "text_large": Route("text_large", FAST_MODEL, 1024, 16384),
+    "pdf_small": Route("pdf_small", FAST_MODEL, 1024, 16384),
+    "strong": Route("strong", STRONG_MODEL, -1, 65535),
+}
+# escalation order when a route's output fails validation
+ESCALATION = {
+    "text_small": "text_large",
+    "text_large": "strong",
+    "pdf_small": "strong",
+    "strong": None,
+}
+
+
+class DocumentProfile(NamedTuple):
+    ext: str
+    size_bytes: int
+    pages: Optional[int] = None
+    text_chars: Optional[int] = None
+    scanned: bool = False
+
+
+def profile_pdf(buf, ext: str = ".pdf") -> DocumentProfile:
+    """Page count and a scanned/text guess from the first few pages."""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(io.BytesIO(buf))
+        pages = len(reader.pages)
+        sample = reader.pages[:PDF_SAMPLE_PAGES]
+        chars = sum(len(p.extract_text() or "") for p in sample)
+        scanned = chars < SCANNED_CHARS_PER_PAGE * max(len(sample), 1)
+    except Exception:
+        # unreadable by pypdf: let the strong model deal with it
+        return DocumentProfile(ext, len(buf), scanned=True)
+    return DocumentProfile(ext, len(buf), pages=pages, scanned=scanned)
+
+
+def profile_pdf_pages(page_texts: List[str], size_bytes: int, ext: str = ".pdf") -> DocumentProfile:
+    """Same as `profile_pdf`, from page texts that were already extracted."""
+    if not page_texts:
+        return DocumentProfile(ext, size_bytes, scanned=True)
+    sample = page_texts[:PDF_SAMPLE_PAGES]
+    scanned = sum(len(t) for t in sample) < SCANNED_CHARS_PER_PAGE * len(sample)
+    return DocumentProfile(ext, size_bytes, pages=len(page_texts), scanned=scanned)
+
+
+def profile_text(text: str, ext: str) -> DocumentProfile:
+    return DocumentProfile(ext, len(text.encode("utf-8")), text_chars=len(text))
+
+
+def choose_route(profile: Optional[DocumentProfile]) -> Route:
+    if profile is None:
+        return ROUTES["strong"]
+    if profile.text_chars is not None:
+        return ROUTES["text_small" if profile.text_chars <= SMALL_TEXT_CHARS else "text_large"]
+    if profile.pages is not None and profile.pages <= SMALL_PDF_PAGES and not profile.scanned:
+        return ROUTES["pdf_small"]
+    return ROUTES["strong"]
+
+
+def escalation_chain(route: Route) -> List[Route]:
+    chain = [route]
+    while ESCALATION.get(chain[-1].name):
+        chain.append(ROUTES[ESCALATION[chain[-1].name]])
+    return chain
+
+
+def validate_output(text: str, finish_reason: Optional[str]) -> bool:
+    """Reject empty, truncated or blocked extractions."""
+    if finish_reason and finish_reason.split(".")[-1] in ("MAX_TOKENS", "SAFETY", "RECITATION", "BLOCKLIST"):
+        return False
+    return len(text.strip()) >= MIN_OUTPUT_CHARS
@@ -0,0 +1,56 @@
+"""Multi-worker entry point: `python serve.py`.
+
+Runs WEB_CONCURRENCY uvicorn workers (default: one per available core). With
+more than one worker, the workers share table versions, cached results, the
+portfolio index and job claims through one SQLite file (SHARED_STATE_PATH).
+Prometheus samples go to PROMETHEUS_MULTIPROC_DIR. Both default to a fresh
+directory under the system temp dir. Every worker runs the startup warm-up
+(WARMUP_ON_STARTUP defaults to 1 here) before taking traffic.
+
+`uvicorn main_app:app` still works for a single process.
+"""
+
+## Standard Libraries
+import glob
+import os
+import shutil
+import tempfile
+from os import environ
+
+HOST = environ.get("HOST", "0.0.0.0")
+PORT = int(environ.get("PORT", 8000))
+
+
+def worker_count() -> int:
+    if environ.get("WEB_CONCURRENCY"):
+        return max(1, int(environ["WEB_CONCURRENCY"]))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main():
+    import uvicorn
+
+    workers = worker_count()
+    environ.setdefault("WARMUP_ON_STARTUP", "1")
+    state_dir = None
+    if workers > 1:
+        state_dir = tempfile.mkdtemp(prefix="bmc-backend-")
+        environ.setdefault("SHARED_STATE_PATH", os.path.join(state_dir, "shared_state.sqlite3"))
+        metrics_dir = environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(state_dir, "prometheus"))
+        os.makedirs(metrics_dir, exist_ok=True)
+        # samples left over from a previous run would be summed into this one
+        for stale in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(stale)
+
+    try:
+        uvicorn.run("main_app:app", host=HOST, port=PORT, workers=workers)
+    finally:
+        if state_dir is not None:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Cross-worker shared cache and job state on SQLite.
+
+With SHARED_STATE_PATH set (serve.py sets it for multi-worker mode) every
+worker opens the same WAL-mode database file, so table versions, cached
+results, the portfolio index and in-flight job claims are seen by all of
+them. Without it the store is an in-memory database private to the process,
+which keeps single-process runs (and the bench) isolated.
+
+Calls are synchronous and may wait up to BUSY_TIMEOUT_S for another worker's
+write; call them from a thread (`asyncio.to_thread`), not the event loop.
+
+Three primitives:
+- key/value with optional TTL (`get`, `put`, `put_if_absent`, `delete`, `scan`, `trim`)
+- monotonically increasing named versions (`bump`, `versions`)
+- job claims (`claim`, `release`) so only one worker runs a given job
+"""
+
+## Standard Libraries
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from os import environ
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SHARED_STATE_PATH = environ.get("SHARED_STATE_PATH", "")
+# how long a call waits for another worker's write lock before failing
+BUSY_TIMEOUT_S = float(environ.get("SHARED_STATE_BUSY_TIMEOUT_S", 5))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL);
+CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at);
+CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+"""
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+_epoch: Optional[str] = None
+# identifies this process as a job owner
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn, _conn_pid
+    if _conn is not None and _conn_pid == os.getpid():
+        return _conn
+    if SHARED_STATE_PATH:
+        conn = sqlite3.connect(SHARED_STATE_PATH, timeout=BUSY_TIMEOUT_S, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    else:
+        conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+    conn.executescript(_SCHEMA)
+    _conn, _conn_pid = conn, os.getpid()
+    return conn
+
+
+def _execute(sql: str, params: Tuple = ()) -> List[tuple]:
+    with _lock:
+        return _connect().execute(sql, params).fetchall()
+
+
+# ---------- key/value ----------
+def get(key: str) -> Optional[Any]:
+    rows = _execute(
+        "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+        (key, time.time()),
+    )
+    return json.loads(rows[0][0]) if rows else None
+
+
+def put(key: str, value: Any, ttl_s: Optional[float] = None):
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        if ttl_s:
+            # expiring entries are short-lived results; drop the stale ones as we go
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), now + ttl_s if ttl_s else None),
+        )
+
+
+def delete(key: str):
+    _execute("DELETE FROM kv WHERE key = ?", (key,))
+
+
+def trim(prefix: str, keep: int) -> List[Tuple[str, Any]]:
+    """Delete all but the `keep` latest-expiring entries under `prefix`, i.e.
+    the most recently put ones when they share a TTL. Returns the deleted
+    (key, value) pairs."""
+    with _lock:
+        conn = _connect()
+        rows = conn.execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?",
+            (prefix, prefix + "\uffff", keep),
+        ).fetchall()
+        conn.executemany("DELETE FROM kv WHERE key = ?", [(k,) for k, _ in rows])
+    return [(k, json.loads(v)) for k, v in rows]
+
+
+def put_if_absent(key: str, value: Any) -> bool:
+    with _lock:
+        cur = _connect().execute(
+            "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, NULL)",
+            (key, json.dumps(value, default=str)),
+        )
+        return cur.rowcount == 1
+
+
+def scan(prefix: str) -> Iterable[Tuple[str, Any]]:
+    """All live (key, value) pairs whose key starts with `prefix`."""
+    rows = _execute(
+        "SELECT key, value FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+        (prefix, prefix + "\uffff", time.time()),
+    )
+    return [(k, json.loads(v)) for k, v in rows]
+
+
+# ---------- versions ----------
+def bump(name: str) -> int:
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT INTO versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            (name,),
+        )
+        return conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+
+
+def versions(names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    rows = dict(
+        _execute(
+            f"SELECT name, version FROM versions WHERE name IN ({', '.join('?' for _ in names)})",
+            tuple(names),
+        )
+    )
+    return {n: rows.get(n, 0) for n in names}
+
+
+def epoch() -> str:
+    """Random id of this store; changes whenever the store is recreated."""
+    global _epoch
+    if _epoch is None:
+        put_if_absent("__epoch__", uuid.uuid4().hex[:8])
+        _epoch = get("__epoch__")
+    return _epoch
+
+
+# ---------- job claims ----------
+def claim(key: str, ttl_s: float) -> bool:
+    """Try to become the only worker running `key`. Expired claims (a worker
+    that died mid-job) can be taken over."""
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        conn.execute("DELETE FROM jobs WHERE key = ? AND expires_at <= ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO jobs (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, WORKER_ID, now + ttl_s),
+        )
+        return cur.rowcount == 1
+
+
+def is_claimed(key: str) -> bool:
+    return bool(_execute("SELECT 1 FROM jobs WHERE key = ? AND expires_at > ?", (key, time.time())))
+
+
+def release(key: str):
+    _execute("DELETE FROM jobs WHERE key = ? AND owner = ?", (key, WORKER_ID))
@@ -0,0 +1,150 @@
+"""Cold-start accounting and explicit warm-up.
+
+Import this module first: with STARTUP_IMPORT_TIMING=1 it installs a
+meta-path hook that times every module executed until `mark_ready()`, so
+`startup_report()` can show which packages a cold start actually paid for.
+The hook is off by default: it wraps module loaders, which costs time on the
+imports being measured and breaks loader-type lookups such as
+`pkg_resources` for the wrapped modules (`python -X importtime` needs no
+hook). `warm_up()` front-loads the heavy SDK imports, credentials, clients
+and agents that are otherwise built on first use.
+"""
+
+## Standard Libraries
+import importlib
+import logging
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from os import environ
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_T0 = time.perf_counter()
+_self_times: Dict[str, float] = defaultdict(float)
+_phases: Dict[str, float] = {}
+_ready_at = None
+_stack: List[float] = []
+
+
+def _package_key(name: str) -> str:
+    parts = name.split(".")
+    if parts[0] == "google":
+        return ".".join(parts[:3] if len(parts) > 2 and parts[1] == "cloud" else parts[:2])
+    return parts[0]
+
+
+class _TimedLoader:
+    """Wraps a loader and records the module's self time (children excluded)."""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = _stack.pop()
+            _self_times[_package_key(module.__name__)] += elapsed - children
+            if _stack:
+                _stack[-1] += elapsed
+
+
+class _TimingFinder:
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader)
+            return spec
+        return None
+
+
+_finder = _TimingFinder() if environ.get("STARTUP_IMPORT_TIMING", "0") == "1" else None
+if _finder is not None:
+    sys.meta_path.insert(0, _finder)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a named warm-up phase (credentials, clients, agents, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = round(time.perf_counter() - start, 4)
+
+
+def mark_ready():
+    global _ready_at
+    if _ready_at is None:
+        _ready_at = time.perf_counter()
+    # modules imported lazily after startup keep their own loaders
+    if _finder in sys.meta_path:
+        sys.meta_path.remove(_finder)
+
+
+# Heavy modules deferred until first use; warm_up() imports them up front.
+HEAVY_MODULES = [
+    "google.oauth2.service_account",
+    "google.cloud.storage",
+    "google.cloud.bigquery",
+    "google.cloud.vision",
+    "google.genai",
+    "google.adk.agents",
+    "google.adk.runners",
+    "docx",
+    "pypdf",
+]
+
+
+def warm_up():
+    """Import SDKs and build credentials, clients, agents and runners now instead of on first request."""
+    import agent_runtime
+    import clients
+    from agents import bmc_agent, experiments_agent, hypothesis_agent
+
+    with phase("imports"):
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+    with phase("credentials"):
+        clients.get_credentials()
+    with phase("clients"):
+        clients.get_storage_client()
+        clients.get_bigquery_client()
+        clients.get_genai_client()
+    with phase("agents"):
+        bmc_agent.get_bmc_pipeline_agent()
+        hypothesis_agent.get_hypothesis_agent()
+        experiments_agent.get_experiment_agent()
+        agent_runtime.get_runner(bmc_agent.get_bmc_pipeline_agent)
+        agent_runtime.get_runner(hypothesis_agent.get_hypothesis_agent)
+        agent_runtime.get_runner(experiments_agent.get_experiment_agent)
+    logger.info("warm-up finished: %s", _phases)
+
+
+def startup_report(top: int = 25) -> Dict[str, Any]:
+    """Import self-time per package plus warm-up phases, slowest first."""
+    imports = sorted(_self_times.items(), key=lambda kv: kv[1], reverse=True)
+    return {
+        "ready_s": round(_ready_at - _T0, 4) if _ready_at else None,
+        "uptime_s": round(time.perf_counter() - _T0, 4),
+        "import_total_s": round(sum(_self_times.values()), 4),
+        "imports": [{"module": k, "self_s": round(v, 4)} for k, v in imports[:top]],
+        "phases": dict(_phases),
+    }
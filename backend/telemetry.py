@@ -0,0 +1,258 @@
+## Standard Libraries
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import environ
+from typing import Any, Dict, Optional
+
+## Third-party Libraries
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+logger = logging.getLogger("telemetry")
+
+# ---------- Optional OTLP export ----------
+# Enabled only when opentelemetry-sdk + the OTLP exporter are installed and
+# OTEL_EXPORTER_OTLP_ENDPOINT is set; otherwise spans are metrics + logs only.
+_tracer = None
+if environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        _provider = TracerProvider(
+            resource=Resource.create({"service.name": environ.get("OTEL_SERVICE_NAME", "adk-bmc-pipeline")})
+        )
+        _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(_provider)
+        _tracer = trace.get_tracer("adk-bmc-pipeline")
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT set but opentelemetry is not installed")
+
+
+# ---------- Metrics ----------
+# Under serve.py with several workers PROMETHEUS_MULTIPROC_DIR is set, each
+# worker writes its samples there and /metrics aggregates all of them.
+MULTIPROCESS = bool(environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ["route", "method", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Latency of a single pipeline stage.",
+    ["stage", "outcome"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens consumed by Gemini calls, by extract_text route ('none' for unrouted calls).",
+    ["model", "route", "kind"],
+)
+CACHE_EVENTS = Counter(
+    "cache_events_total",
+    "Cache lookups by cache and result.",
+    ["cache", "result"],
+)
+BIGQUERY_JOBS = Counter(
+    "bigquery_jobs_total",
+    "BigQuery jobs issued, by operation.",
+    ["operation"],
+)
+BIGQUERY_JOBS_PER_REQUEST = Histogram(
+    "bigquery_jobs_per_request",
+    "BigQuery jobs issued while serving one HTTP request.",
+    ["route"],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+LLM_ADMISSION = Counter(
+    "llm_admission_total",
+    "LLM admission decisions (admitted, queued, rejected, retried).",
+    ["model", "result"],
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "llm_concurrency_limit",
+    "Current AIMD concurrency limit per model.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight",
+    "LLM calls currently holding an admission slot.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for an admission slot.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+HEDGES = Counter(
+    "llm_hedges_total",
+    "Hedged LLM requests (launched, no_budget, primary_won, hedge_won).",
+    ["call_type", "result"],
+)
+EXTRACT_ROUTE_LATENCY = Histogram(
+    "extract_route_duration_seconds",
+    "extract_text latency per routing decision.",
+    ["route", "model", "valid"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+NEARDUP_PAGES = Counter(
+    "neardup_pages_total",
+    "Document pages whose extraction was reused from a near-duplicate vs extracted.",
+    ["result"],
+)
+
+# Per-request accumulator; a dict so worker threads spawned from the request
+# (copied contexts) update the same object.
+_request_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any):
+    """Time a pipeline stage.
+
+    Records pipeline_stage_duration_seconds{stage}, emits one structured log
+    line, and opens an OTLP span when tracing is enabled.
+    """
+    otel_cm = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel_cm is not None:
+        otel_cm.__enter__()
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage, outcome=outcome).observe(elapsed)
+        logger.info(
+            "span stage=%s outcome=%s duration_ms=%.1f %s",
+            stage,
+            outcome,
+            elapsed * 1000,
+            " ".join(f"{k}={v}" for k, v in attributes.items()),
+        )
+        if otel_cm is not None:
+            otel_cm.__exit__(*sys.exc_info())
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok"):
+    """Record a stage duration measured elsewhere (e.g. from ADK event timings)."""
+    STAGE_LATENCY.labels(stage=stage, outcome=outcome).observe(seconds)
+    logger.info("span stage=%s outcome=%s duration_ms=%.1f", stage, outcome, seconds * 1000)
+
+
+class AgentStageTimer:
+    """Turn a stream of ADK events into per-agent stage timings and token counts.
+
+    A stage starts when the previous agent's last event arrives (or when the
+    runner starts) and ends at the next change of `event.author`.
+    """
+
+    def __init__(self, models: Dict[str, str]):
+        self.models = models
+        self.current: Optional[str] = None
+        self.started = time.perf_counter()
+
+    def on_event(self, event) -> None:
+        author = getattr(event, "author", None)
+        now = time.perf_counter()
+        if author != self.current:
+            if self.current is not None:
+                observe_stage(self.current, now - self.started)
+                self.started = now
+            self.current = author
+        record_tokens(self.models.get(author, "unknown"), getattr(event, "usage_metadata", None))
+
+    def finish(self, outcome: str = "ok") -> None:
+        if self.current is not None:
+            observe_stage(self.current, time.perf_counter() - self.started, outcome)
+            self.current = None
+
+
+def record_tokens(model: str, usage_metadata, route: str = "none") -> None:
+    """Add a genai `usage_metadata` object to the token counters."""
+    if usage_metadata is None:
+        return
+    for kind, attr in (
+        ("prompt", "prompt_token_count"),
+        ("output", "candidates_token_count"),
+        ("thinking", "thoughts_token_count"),
+    ):
+        value = getattr(usage_metadata, attr, None)
+        if value:
+            LLM_TOKENS.labels(model=model, route=route, kind=kind).inc(value)
+
+
+def record_route(route: str, model: str, seconds: float, valid: bool) -> None:
+    """One extract_text attempt on a route; invalid outputs escalate."""
+    EXTRACT_ROUTE_LATENCY.labels(route=route, model=model, valid=str(valid).lower()).observe(seconds)
+    if not valid:
+        logger.info("extract_text route=%s model=%s failed validation; escalating", route, model)
+
+
+def record_neardup_pages(reused: int, extracted: int) -> None:
+    NEARDUP_PAGES.labels(result="reused").inc(reused)
+    NEARDUP_PAGES.labels(result="extracted").inc(extracted)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_bigquery_job(operation: str) -> None:
+    BIGQUERY_JOBS.labels(operation=operation).inc()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["bigquery_jobs"] += 1
+
+
+async def metrics_middleware(request, call_next):
+    """Per-request latency and BigQuery job count, keyed by route template."""
+    token = _request_stats.set({"bigquery_jobs": 0})
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.labels(route=path, method=request.method, status=status).observe(
+            time.perf_counter() - start
+        )
+        BIGQUERY_JOBS_PER_REQUEST.labels(route=path).observe(_request_stats.get()["bigquery_jobs"])
+        _request_stats.reset(token)
+
+
+def render_metrics():
+    """Return (body, content_type) for the Prometheus scrape endpoint."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess aggregate on shutdown."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
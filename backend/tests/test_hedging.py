@@ -0,0 +1,28 @@
+import asyncio
+import random
+
+import hedging
+
+
+def test_delay_stays_at_ttft_percentile(monkeypatch):
+    """Slow first tokens keep being sampled once the hedge delay is in use."""
+    monkeypatch.setattr(hedging, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY_S", 0.0)
+    # no hedge budget: every primary runs to its first token
+    hedger = hedging.Hedger("test", budget_ratio=0.0)
+    rng = random.Random(0)
+
+    async def call(signal):
+        signal.started.set()
+        # uniform TTFT of 20-120 ms: the true p95 is ~0.115 s
+        await asyncio.sleep(rng.uniform(0.02, 0.12))
+        signal.first_token.set()
+        await asyncio.sleep(0)
+        return "ok"
+
+    async def main():
+        for _ in range(20):
+            await asyncio.gather(*(hedger.run(call) for _ in range(30)))
+
+    asyncio.run(main())
+    assert 0.105 <= hedger.delay() <= 0.135